@@ -2,145 +2,20 @@ import sys
 import os
 import csv  # ✅ Add to your imports at the top
 import shutil
-import re
-import json
 from PySide6.QtWidgets import (
-    QApplication, QWidget, QPushButton, QVBoxLayout, QTextEdit,
-    QFileDialog, QLabel, QLineEdit, QRadioButton, QHBoxLayout, QProgressBar
+    QApplication, QWidget, QPushButton, QVBoxLayout, QPlainTextEdit,
+    QFileDialog, QLabel, QLineEdit, QRadioButton, QHBoxLayout, QProgressBar, QCheckBox
 )
 from PySide6.QtCore import Qt, QSettings
-from PyPDF2 import PdfReader
 import openai
+from extractor_core import ARTICLES_PER_PROMPT, CSV_BATCH_ROWS, DEFAULT_PROMPT
+from parallel_openai import CHARS_PER_TOKEN
+from extraction_thread import ExtractionThread
 
-# ✅ DEFAULT PROMPT
-DEFAULT_PROMPT = (
-    "In each academic article, identify a positionality statement — a paragraph or explicit passage "
-    "where the author describes aspects of their personal identity, background, experiences, assumptions, "
-    "or biases. These statements typically clarify how the author's identity or experiences have influenced "
-    "the framing, design, or interpretation of the research. Positionality statements often include explicit "
-    "mentions of ethnicity, race, gender, socioeconomic status, educational background, professional role, "
-    "or personal connection to the topic. Detect these statements (or confirm their absence) and extract "
-    "relevant examples to understand how the author situates themselves within the research context."
-)
-
-# --------------- AI Helper Functions ---------------
-
-def get_ai_summary(text, custom_prompt=None):
-    if not openai.api_key:
-        return "[Error: no API key set]"
-    prompt_content = custom_prompt or DEFAULT_PROMPT
-    try:
-        truncated = text[:20000]
-        messages = [
-            {"role": "system", "content": "You are an assistant that identifies and summarizes positionality statements."},
-            {"role": "user", "content": f"{prompt_content}\n\nArticle text: {truncated}"}
-        ]
-        resp = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            max_tokens=300,
-            temperature=0.5
-        )
-        return resp.choices[0].message.content.strip()
-    except Exception as e:
-        return f"[Error calling OpenAI API: {e}]"
-
-
-def extract_positionality_from_pdf(pdf_path, custom_prompt=None):
-    try:
-        reader = PdfReader(pdf_path)
-        text = "".join(page.extract_text() or "" for page in reader.pages)
-        if not text.strip():
-            return f"[{os.path.basename(pdf_path)}] No readable text."
-        snippet = text[:1000].replace("\n", " ")
-        return snippet + "..."
-    except Exception as e:
-        return f"[{os.path.basename(pdf_path)}] Error: {e}"
-
-
-def get_author_name(text):
-    if not openai.api_key:
-        return ""
-    try:
-        truncated = text[:1500]
-        messages = [
-            {"role": "system", "content": "You are an assistant that extracts author names from academic articles. Return a comma-separated list of author names only, with no additional commentary."},
-            {"role": "user", "content": f"Extract the author name(s) from this article text and return a comma-separated list ONLY: {truncated}"}
-        ]
-        resp = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            max_tokens=50,
-            temperature=0.0
-        )
-        return resp.choices[0].message.content.strip()
-    except Exception:
-        return ""
-
-# --------------- Metadata Extraction Routines ---------------
-
-def extract_metadata_pdfinfo(pdf_path):
-    reader = PdfReader(pdf_path)
-    info = reader.metadata or {}
-    return {
-        "Title": info.get("/Title", ""),
-        "Author": info.get("/Author", ""),
-        "CreationDate": info.get("/CreationDate", ""),
-        "Producer": info.get("/Producer", ""),
-        "Journal": "",
-        "Volume": "",
-        "Issue": ""
-    }
-
-
-def extract_metadata_regex(text):
-    meta = {"Journal": "", "Volume": "", "Issue": ""}
-    m = re.search(r"^(.*Journal.*?)\s*\|\s*Vol\.?\s*(\d+),\s*No\.?\s*(\d+)", text, re.IGNORECASE | re.MULTILINE)
-    if m:
-        meta["Journal"] = m.group(1).strip()
-        meta["Volume"] = m.group(2)
-        meta["Issue"] = m.group(3)
-    else:
-        jm = re.search(r"Journal[:\s]+([^\n]+)", text, re.IGNORECASE)
-        if jm: meta["Journal"] = jm.group(1).strip()
-        vm = re.search(r"Volume\s*(\d+)", text, re.IGNORECASE)
-        if vm: meta["Volume"] = vm.group(1)
-        im = re.search(r"Issue\s*(\d+)", text, re.IGNORECASE)
-        if im: meta["Issue"] = im.group(1)
-    return meta
-
-
-def extract_metadata_ai(text):
-    if not openai.api_key:
-        return {}
-    prompt = f"Extract JSON fields: author, journal, volume, issue from this text:\n{text[:1500]}"
-    try:
-        resp = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=100,
-            temperature=0.0
-        )
-        return json.loads(resp.choices[0].message.content)
-    except Exception:
-        return {}
-
-
-def get_pdf_metadata(pdf_path):
-    base = extract_metadata_pdfinfo(pdf_path)
-    reader = PdfReader(pdf_path)
-    first_page = reader.pages[0].extract_text() or ""
-    regex_meta = extract_metadata_regex(first_page)
-    for key in ["Journal", "Volume", "Issue"]:
-        if not base.get(key) and regex_meta.get(key):
-            base[key] = regex_meta[key]
-    if openai.api_key:
-        ai_meta = extract_metadata_ai(first_page)
-        for field in ["author", "journal", "volume", "issue"]:
-            cap = field.capitalize()
-            if not base.get(cap) and ai_meta.get(field):
-                base[cap] = ai_meta[field]
-    return base
+# Model for every OpenAI call, all sent through extractor_core
+MODEL = "gpt-4o"
+# This GUI has always shown the model the first 20,000 characters, 4x the shared default
+AI_TEXT_TOKENS = 20000 // CHARS_PER_TOKEN
 
 # --------------- GUI Application ---------------
 
@@ -169,11 +44,16 @@ class PDFExtractorGUI(QWidget):
         mode_layout = QHBoxLayout()
         self.keyword_radio = QRadioButton("Keyword Search")
         self.ai_radio = QRadioButton("AI Analysis")
+        self.batch_radio = QRadioButton("AI Batch (50% cost, up to 24h)")
         self.ai_radio.setChecked(True)
         mode_layout.addWidget(self.keyword_radio)
         mode_layout.addWidget(self.ai_radio)
+        mode_layout.addWidget(self.batch_radio)
         layout.addLayout(mode_layout)
 
+        self.group_check = QCheckBox(f"Send up to {ARTICLES_PER_PROMPT} articles per AI request (fewer tokens)")
+        layout.addWidget(self.group_check)
+
         self.key_input = QLineEdit()
         self.key_input.setPlaceholderText("Enter OpenAI API key (masked)")
         self.key_input.setEchoMode(QLineEdit.Password)
@@ -200,7 +80,7 @@ class PDFExtractorGUI(QWidget):
         self.progress_bar.setValue(0)
         layout.addWidget(self.progress_bar)
 
-        self.output_box = QTextEdit()
+        self.output_box = QPlainTextEdit()
         self.output_box.setReadOnly(True)
         layout.addWidget(self.output_box)
 
@@ -224,64 +104,70 @@ class PDFExtractorGUI(QWidget):
             return
         openai.api_key = self.key_input.text().strip()
         self.settings.setValue("api_key", openai.api_key)
-        if self.ai_radio.isChecked() and not openai.api_key:
+        use_ai = not self.keyword_radio.isChecked()
+        if use_ai and not openai.api_key:
             self.output_box.setPlainText("Error: enter OpenAI API key for AI Analysis.")
             return
 
         prompt = self.prompt_input.text().strip() or DEFAULT_PROMPT
-        output_text = ""
-        pdf_files = [f for f in os.listdir(self.selected_directory) if f.lower().endswith(".pdf")]
-        total = len(pdf_files)
+        with os.scandir(self.selected_directory) as entries:
+            pdf_paths = [e.path for e in entries if e.is_file() and e.name.lower().endswith(".pdf")]
+        total = len(pdf_paths)
         if total == 0:
             self.output_box.setPlainText("No PDF files found.")
             return
 
         self.progress_bar.setRange(0, total)
         self.progress_bar.setValue(0)
+        self.total = total
+        self.run_button.setEnabled(False)
+        self.status_label.setText(f"Processing 0/{total} (0%)")
 
         csv_path = os.path.join(self.selected_directory, "output.csv")
         self.last_csv_path = csv_path
-
-        with open(csv_path, "w", newline='', encoding="utf-8") as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["Filename", "Title", "Author", "Journal", "Volume", "Issue", "CreationDate", "Producer", "Summary"])
-
-            for idx, filename in enumerate(pdf_files, 1):
-                self.status_label.setText(f"Processing {idx}/{total} ({idx*100//total}%)")
-                QApplication.processEvents()
-                self.progress_bar.setValue(idx)
-
-                pdf_path = os.path.join(self.selected_directory, filename)
-                meta = get_pdf_metadata(pdf_path)
-                try:
-                    full_text = "".join(page.extract_text() or "" for page in PdfReader(pdf_path).pages)
-                    author = meta['Author'] or (get_author_name(full_text) if self.ai_radio.isChecked() else "")
-                    if self.keyword_radio.isChecked():
-                        summary = extract_positionality_from_pdf(pdf_path)
-                    else:
-                        summary = get_ai_summary(full_text, prompt)
-
-                    line = (
-                        f"{filename}:\n"
-                        f"  Title: {meta['Title']}\n"
-                        f"  Author: {author}\n"
-                        f"  Journal: {meta['Journal']}\n"
-                        f"  Volume: {meta['Volume']}\n"
-                        f"  Issue: {meta['Issue']}\n"
-                        f"  CreationDate: {meta['CreationDate']}\n"
-                        f"  Producer: {meta['Producer']}\n"
-                        f"Summary: {summary}\n\n"
-                    )
-                    output_text += line
-                    writer.writerow([filename, meta['Title'], author, meta['Journal'], meta['Volume'], meta['Issue'], meta['CreationDate'], meta['Producer'], summary])
-                except Exception as e:
-                    error_msg = f"{filename}: Error - {e}\n"
-                    output_text += error_msg
-                    writer.writerow([filename, "", "", "", "", "", "", "", error_msg.strip()])
-
-        self.output_box.setPlainText(output_text)
+        self.csvfile = open(csv_path, "w", newline='', encoding="utf-8")
+        self.writer = csv.writer(self.csvfile)
+        self.writer.writerow(["Filename", "Title", "Author", "Journal", "Volume", "Issue", "CreationDate", "Producer", "Summary"])
+        self.pending_rows = []
+        self.output_box.clear()
+
+        # PDF parsing fans out over a process pool inside the worker while the
+        # OpenAI calls run on its asyncio loop, so CPU and network work overlap.
+        # A 24h batch job is pointless for one file; send it through the realtime path instead.
+        batch = self.batch_radio.isChecked() and total > 1
+        group_size = ARTICLES_PER_PROMPT if self.group_check.isChecked() else 1
+        self.worker = ExtractionThread(pdf_paths, openai.api_key, use_ai, prompt, batch=batch,
+                                       model=MODEL, group_size=group_size, text_tokens=AI_TEXT_TOKENS,
+                                       parent=self)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.status.connect(self.status_label.setText)
+        self.worker.row_ready.connect(self.on_row)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.start()
+
+    def on_progress(self, done):
+        self.status_label.setText(f"Processing {done}/{self.total} ({done*100//self.total}%)")
+        self.progress_bar.setValue(done)
+
+    def on_row(self, result):
+        entry, row = result
+        self.pending_rows.append(row)
+        # Written and flushed every CSV_BATCH_ROWS rows, so a crash mid-run loses at most that many
+        if len(self.pending_rows) >= CSV_BATCH_ROWS:
+            self.flush_rows()
+        self.output_box.appendPlainText(entry.rstrip("\n") + "\n")
+
+    def flush_rows(self):
+        self.writer.writerows(self.pending_rows)
+        self.pending_rows.clear()
+        self.csvfile.flush()
+
+    def on_finished(self):
+        self.flush_rows()
+        self.csvfile.close()
         self.status_label.setText("Completed")
         self.save_button.setEnabled(True)
+        self.run_button.setEnabled(True)
 
     def save_csv(self):
         if not self.last_csv_path:
@@ -296,7 +182,7 @@ class PDFExtractorGUI(QWidget):
         )
         if dest:
             try:
-                shutil.copy(self.last_csv_path, dest)
+                shutil.copyfile(self.last_csv_path, dest)
                 self.status_label.setText(f"CSV saved to {dest}" )
             except Exception as e:
                 self.status_label.setText(f"Error saving CSV: {e}")
@@ -8,8 +8,8 @@ from PySide6.QtWidgets import (
     QApplication, QWidget, QPushButton, QVBoxLayout, QTextEdit,
     QFileDialog, QLabel, QLineEdit, QRadioButton, QHBoxLayout, QProgressBar
 )
-from PySide6.QtCore import Qt, QSettings
-from PyPDF2 import PdfReader
+from PySide6.QtCore import Qt, QSettings, QObject, QThread, Signal, Slot
+from extractor_core import load_pdf_text
 from metadata_extractor import extract_metadata
 import openai
 
@@ -19,6 +19,108 @@ PROMPT = (
     "Provide the statement verbatim if present; if none is present, state 'No positionality statement found.'"
 )
 
+# Model used by extract_positionality_from_pdf
+MODEL = "gpt-4o"
+
+# Finished rows are buffered and handed to writerows() this many at a time
+CSV_BATCH_ROWS = 50
+
+CSV_FIELDS = ["Filename", "Title", "Author", "CreationDate", "Producer",
+              "Journal", "Volume", "Issue", "Summary"]
+
+
+def extract_positionality_from_pdf(pdf_path, custom_prompt):
+    """
+    Ask OpenAI (module-level client, key from OPENAI_API_KEY) for the positionality
+    statement in the opening text of the PDF. Errors come back as the summary text.
+    """
+    try:
+        # The prompt only sees the first 5000 chars, so stop extracting pages soon after
+        text = load_pdf_text(pdf_path, 6000)
+        if not text.strip():
+            return f"[{os.path.basename(pdf_path)}] No readable text."
+        snippet = text.replace("\n", " ")[:5000]
+        messages = [
+            {"role": "system", "content": "You are an assistant that extracts positionality statements from academic articles."},
+            {"role": "user", "content": f"{custom_prompt}\n\n{snippet}"}
+        ]
+        resp = openai.chat.completions.create(model=MODEL, messages=messages, max_tokens=500, temperature=0.0)
+        return resp.choices[0].message.content.strip()
+    except Exception as e:
+        return f"[{os.path.basename(pdf_path)}] Error: {e}"
+
+
+class ExtractionWorker(QObject):
+    """
+    Runs the per-PDF loop on a background QThread and reports back via signals,
+    so the window stays responsive without processEvents().
+    """
+    progress = Signal(int)
+    log = Signal(str)
+    done = Signal()
+
+    def __init__(self, pdfs, csv_path, prompt):
+        super().__init__()
+        self.pdfs = pdfs
+        self.csv_path = csv_path
+        self.prompt = prompt
+
+    @Slot()
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.log.emit(f"❌ Extraction stopped: {e}\n")
+        finally:
+            # Always re-enable the window, even if the CSV could not be written
+            self.done.emit()
+
+    def _run(self):
+        total = len(self.pdfs)
+        last_pct = -1
+        with open(self.csv_path, "w", newline='', encoding='utf-8', buffering=1 << 20) as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+
+            rows = []
+            for idx, entry in enumerate(self.pdfs, start=1):
+                fname, pdf_path = entry.name, entry.path
+                pct = int(idx/total*100)
+                if pct != last_pct:
+                    self.progress.emit(pct)
+                    last_pct = pct
+
+                try:
+                    # Extract metadata
+                    meta = extract_metadata(pdf_path)
+                    # Extract positionality
+                    summary = extract_positionality_from_pdf(pdf_path, self.prompt)
+                except Exception as e:
+                    # One unreadable PDF gets an error row instead of ending the run
+                    meta, summary = {}, f"[{fname}] Error: {e}"
+
+                # Buffer row; written CSV_BATCH_ROWS at a time
+                rows.append({
+                    "Filename": fname,
+                    "Title": meta.get("title", ""),
+                    "Author": meta.get("author", ""),
+                    "CreationDate": meta.get("creation_date", ""),
+                    "Producer": meta.get("producer", ""),
+                    "Journal": meta.get("journal", ""),
+                    "Volume": meta.get("volume", ""),
+                    "Issue": meta.get("issue", ""),
+                    "Summary": summary
+                })
+                if len(rows) >= CSV_BATCH_ROWS:
+                    writer.writerows(rows)
+                    rows.clear()
+
+                # Update output window
+                self.log.emit(f"{fname}: {summary}\n")
+
+            writer.writerows(rows)
+
+
 class PDFExtractorGUI(QWidget):
     def __init__(self):
         super().__init__()
@@ -92,58 +194,38 @@ class PDFExtractorGUI(QWidget):
         # Prepare CSV
         csv_path = os.path.join(folder, "output.csv")
         self.last_csv_path = csv_path
-        with open(csv_path, "w", newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                "Filename", "Title", "Author", "CreationDate", "Producer",
-                "Journal", "Volume", "Issue", "Summary"
-            ])
-            writer.writeheader()
 
-            pdfs = [f for f in os.listdir(folder) if f.lower().endswith('.pdf')]
-            total = len(pdfs)
-            for idx, fname in enumerate(pdfs, start=1):
-                pdf_path = os.path.join(folder, fname)
-                self.progress.setValue(int(idx/total*100))
-                QApplication.processEvents()
-
-                # Extract metadata
-                meta = extract_metadata(pdf_path)
-                title = meta.get("title", "")
-                author = meta.get("author", "")
-                creation = meta.get("creation_date", "")
-                producer = meta.get("producer", "") if 'producer' in meta else ""
-                journal = meta.get("journal", "")
-                volume = meta.get("volume", "")
-                issue = meta.get("issue", "")
-
-                # Extract positionality
-                prompt = self.prompt_input.text() or PROMPT
-                summary = extract_positionality_from_pdf(pdf_path, prompt)
-
-                # Write row
-                writer.writerow({
-                    "Filename": fname,
-                    "Title": title,
-                    "Author": author,
-                    "CreationDate": creation,
-                    "Producer": producer,
-                    "Journal": journal,
-                    "Volume": volume,
-                    "Issue": issue,
-                    "Summary": summary
-                })
-
-                # Update output window
-                self.output.append(f"{fname}: {summary}\n")
+        with os.scandir(folder) as entries:
+            pdfs = sorted((e for e in entries if e.is_file() and e.name.lower().endswith(".pdf")),
+                          key=lambda e: e.name)
 
+        # The loop runs on a worker thread; its signals drive the log and progress bar.
+        # Run stays disabled until it finishes, so a second click cannot start another pass
+        self.run_button.setEnabled(False)
+        self.save_button.setEnabled(False)
+        self.progress.setValue(0)
+        self.worker_thread = QThread(self)
+        self.worker = ExtractionWorker(pdfs, csv_path, self.prompt_input.text() or PROMPT)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.progress.setValue)
+        self.worker.log.connect(self.output.append)
+        self.worker.done.connect(self.on_done)
+        self.worker.done.connect(self.worker_thread.quit)
+        self.worker.done.connect(self.worker.deleteLater)
+        self.worker_thread.finished.connect(self.worker_thread.deleteLater)
+        self.worker_thread.start()
+
+    def on_done(self):
         self.save_button.setEnabled(True)
+        self.run_button.setEnabled(True)
         self.status_label.setText("Completed")
 
     def save_csv(self):
         dest, _ = QFileDialog.getSaveFileName(self, "Save CSV", filter="CSV Files (*.csv)")
         if dest:
             try:
-                shutil.copy(self.last_csv_path, dest)
+                shutil.copyfile(self.last_csv_path, dest)
                 self.status_label.setText(f"CSV saved to {dest}")
             except Exception as e:
                 self.status_label.setText(f"Error saving CSV: {e}")
@@ -4,14 +4,16 @@ import csv  # ✅ Add to your imports at the top
 import shutil
 import re
 import json
+import threading
 import pdfplumber
 from PySide6.QtWidgets import (
     QApplication, QWidget, QPushButton, QVBoxLayout, QTextEdit,
     QFileDialog, QLabel, QLineEdit, QRadioButton, QHBoxLayout, QProgressBar
 )
-from PySide6.QtCore import Qt, QSettings, QDir
-from PyPDF2 import PdfReader
+from PySide6.QtCore import Qt, QSettings, QDir, QObject, QRunnable, QThreadPool, Signal
+from extractor_core import load_pdf_text
 from metadata_extractor import extract_metadata
+from response_cache import ResponseCache, file_digest, request_key
 import openai
 
 # ✅ DEFAULT PROMPT
@@ -20,14 +22,20 @@ PROMPT = (
     "Provide the statement verbatim if present; if none is present, state 'No positionality statement found.'"
 )
 
+# First-person hedging sentence used as a fallback when the model finds nothing; compiled once at import
+_RE_POSITIONALITY = re.compile(r"\b[Ii]\s+(?:may|am|caution|argue)[^.]+\.")
+
+# Model used by extract_positionality_from_pdf; part of the result cache key
+MODEL = "gpt-4o"
+
 # — Positionality Extraction Function —
-def extract_positionality_from_pdf(pdf_path, custom_prompt):
+def extract_positionality_from_pdf(pdf_path, custom_prompt, client):
     """
-    Use PDF text and OpenAI to extract a positionality statement.
+    Use PDF text and OpenAI (through the GUI's shared client) to extract a positionality statement.
     """
     try:
-        reader = PdfReader(pdf_path)
-        text = "".join(page.extract_text() or "" for page in reader.pages)
+        # The prompt only sees the first 5000 chars, so stop extracting pages soon after
+        text = load_pdf_text(pdf_path, 6000)
         if not text.strip():
             return f"[{os.path.basename(pdf_path)}] No positionality statement found."
         # Prepare messages
@@ -37,21 +45,99 @@ def extract_positionality_from_pdf(pdf_path, custom_prompt):
             {"role": "system", "content": "You are an assistant that extracts positionality statements from academic articles. Look for first-person reflections (I, we)."},
             {"role": "user", "content": f"{custom_prompt}\n\n{snippet}"}
         ]
-        resp = openai.chat.completions.create(
-            model="gpt-4o",
+        resp = client.chat.completions.create(
+            model=MODEL,
             messages=messages,
             max_tokens=500,
             temperature=0.0
         )
         result = resp.choices[0].message.content.strip()
-        # Regex fallback
-        m = re.search(r"\b[Ii]\s+(?:may|am|caution|argue)[^\.]+\.", full_text)
-        if "No positionality statement found" in result and m:
-            return m.group(0)
+        # Regex fallback, only scanned when the model came back empty-handed
+        if "No positionality statement found" in result:
+            m = _RE_POSITIONALITY.search(full_text)
+            if m:
+                return m.group(0)
         return result
     except Exception as e:
         return f"[{os.path.basename(pdf_path)}] Error: {e}"
 
+# Finished rows are buffered and handed to writerows() this many at a time
+CSV_BATCH_ROWS = 50
+
+CSV_FIELDS = ["Filename", "Title", "Author", "CreationDate", "Producer",
+              "Journal", "Volume", "Issue", "Summary"]
+
+# Bump to invalidate cached rows after changing how a PDF is analysed
+RESULT_CACHE_VERSION = 1
+
+# Pool threads share the cache file, but an sqlite connection must stay on its own thread
+_local = threading.local()
+
+
+def result_cache():
+    if not hasattr(_local, "cache"):
+        _local.cache = ResponseCache()
+    return _local.cache
+
+
+class WorkerSignals(QObject):
+    row_done = Signal(dict)
+
+
+class PDFWorker(QRunnable):
+    """
+    Metadata + positionality for one PDF on a QThreadPool thread; the finished
+    CSV row is posted back to the GUI through signals.row_done.
+    A PDF whose bytes and settings match an earlier run is served from the
+    ResponseCache results table without parsing it or calling OpenAI.
+    """
+
+    def __init__(self, pdf_path, prompt, client, settings_key):
+        super().__init__()
+        self.pdf_path = pdf_path
+        self.prompt = prompt
+        self.client = client
+        self.settings_key = settings_key
+        self.signals = WorkerSignals()
+
+    def run(self):
+        fname = os.path.basename(self.pdf_path)
+        # The cache is best-effort: a read or sqlite error (e.g. "database is locked")
+        # only means this file is analysed afresh, never that its row goes missing
+        digest = cached = None
+        try:
+            digest = file_digest(self.pdf_path)
+            cached = result_cache().get_result(digest, self.settings_key)
+        except Exception as e:
+            print(f"Result cache lookup failed for {fname}: {e}")
+        if cached is not None:
+            self.signals.row_done.emit(dict(cached, Filename=fname))
+            return
+        try:
+            meta = extract_metadata(self.pdf_path)
+            summary = extract_positionality_from_pdf(self.pdf_path, self.prompt, self.client)
+        except Exception as e:
+            meta, summary = {}, f"[{fname}] Error: {e}"
+        row = {
+            "Filename": fname,
+            "Title": meta.get("title", ""),
+            "Author": meta.get("author", ""),
+            "CreationDate": meta.get("creation_date", ""),
+            "Producer": meta.get("producer", ""),
+            "Journal": meta.get("journal", ""),
+            "Volume": meta.get("volume", ""),
+            "Issue": meta.get("issue", ""),
+            "Summary": summary
+        }
+        # Failed files are retried on the next run instead of being cached
+        if digest and f"[{fname}] Error:" not in summary:
+            try:
+                result_cache().set_result(digest, self.settings_key, row)
+            except Exception as e:
+                print(f"Result cache store failed for {fname}: {e}")
+        self.signals.row_done.emit(row)
+
+
 class PDFExtractorGUI(QWidget):
     def __init__(self):
         super().__init__()
@@ -73,9 +159,6 @@ class PDFExtractorGUI(QWidget):
         self.api_input.setEchoMode(QLineEdit.Password)
         self.api_input.setPlaceholderText("sk-…")
         self.api_input.setText(self.settings.value("openai_api_key", ""))
-        self.api_input.editingFinished.connect(
-            lambda: self.settings.setValue("openai_api_key", self.api_input.text())
-        )
 
         # Mode selection
         self.keyword_radio = QRadioButton("Keyword Search")
@@ -129,6 +212,13 @@ class PDFExtractorGUI(QWidget):
 
         self.setLayout(layout)
         self.last_csv_path = None
+        self.client = None
+
+    def closeEvent(self, event):
+        # The API key is persisted once here rather than on every editingFinished
+        self.settings.setValue("openai_api_key", self.api_input.text())
+        self.settings.sync()
+        super().closeEvent(event)
 
     def choose_folder(self):
         # Open dialog at last-used folder
@@ -142,61 +232,70 @@ class PDFExtractorGUI(QWidget):
     def run_extraction(self):
         # Apply the API key for this run
         openai.api_key = self.api_input.text().strip()
+        # One client per key: every worker shares its keep-alive pool instead of
+        # paying a TCP+TLS handshake per file
+        if self.client is None or self.client.api_key != openai.api_key:
+            self.client = openai.OpenAI(api_key=openai.api_key, max_retries=5, timeout=30.0)
 
         folder = self.folder_label.text()
         if not os.path.isdir(folder):
             self.status_label.setText("Please select a valid folder.")
             return
 
-        # Prepare CSV
+        # Prepare CSV; rows are written by on_row as the workers finish
         csv_path = os.path.join(folder, "output.csv")
         self.last_csv_path = csv_path
-        with open(csv_path, "w", newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                "Filename", "Title", "Author", "CreationDate", "Producer",
-                "Journal", "Volume", "Issue", "Summary"
-            ])
-            writer.writeheader()
-
-            pdfs = [pdf for pdf in os.listdir(folder) if pdf.lower().endswith('.pdf')]
-            total = len(pdfs)
-            for idx, fname in enumerate(pdfs, start=1):
-                pdf_path = os.path.join(folder, fname)
-                percent = int(idx / total * 100)
-                self.progress.setValue(percent)
-                self.status_label.setText(f"{percent}%")
-                QApplication.processEvents()
-
-                # Extract metadata
-                meta = extract_metadata(pdf_path)
-                title = meta.get("title", "")
-                author = meta.get("author", "")
-                creation = meta.get("creation_date", "")
-                producer = meta.get("producer", "")
-                journal = meta.get("journal", "")
-                volume = meta.get("volume", "")
-                issue = meta.get("issue", "")
-
-                # Extract positionality
-                prompt = self.prompt_input.text() or PROMPT
-                summary = extract_positionality_from_pdf(pdf_path, prompt)
-
-                # Write row
-                writer.writerow({
-                    "Filename": fname,
-                    "Title": title,
-                    "Author": author,
-                    "CreationDate": creation,
-                    "Producer": producer,
-                    "Journal": journal,
-                    "Volume": volume,
-                    "Issue": issue,
-                    "Summary": summary
-                })
-
-                # Update output window
-                self.output.append(f"{fname}: {summary}\n")
+        self.csvfile = open(csv_path, "w", newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.csvfile, fieldnames=CSV_FIELDS)
+        self.writer.writeheader()
+        self.pending_rows = []
+
+        with os.scandir(folder) as entries:
+            pdfs = sorted((e for e in entries if e.is_file() and e.name.lower().endswith(".pdf")),
+                          key=lambda e: e.name)
+        self.total = len(pdfs)
+        self.done = 0
+        if self.total == 0:
+            self.on_finished()
+            return
+        self.run_button.setEnabled(False)
+        self.save_button.setEnabled(False)
+        self.progress.setValue(0)
+        self.status_label.setText("0%")
+
+        # One runnable per PDF; PyPDF2 parsing and the OpenAI calls run on pool
+        # threads so the event loop never blocks
+        prompt = self.prompt_input.text() or PROMPT
+        settings_key = request_key({"version": RESULT_CACHE_VERSION, "prompt": prompt, "model": MODEL})
+        pool = QThreadPool.globalInstance()
+        pool.setMaxThreadCount(min(os.cpu_count() or 1, 8))
+        for entry in pdfs:
+            worker = PDFWorker(entry.path, prompt, self.client, settings_key)
+            worker.signals.row_done.connect(self.on_row)
+            pool.start(worker)
+
+    def on_row(self, row):
+        self.pending_rows.append(row)
+        if len(self.pending_rows) >= CSV_BATCH_ROWS:
+            self.flush_rows()
+        self.output.append(f"{row['Filename']}: {row['Summary']}\n")
+        self.done += 1
+        percent = int(self.done / self.total * 100)
+        self.progress.setValue(percent)
+        self.status_label.setText(f"{percent}%")
+        if self.done == self.total:
+            self.on_finished()
+
+    def flush_rows(self):
+        # Only ever called from GUI-thread slots, so no lock is needed around the writer
+        self.writer.writerows(self.pending_rows)
+        self.pending_rows.clear()
+        self.csvfile.flush()
 
+    def on_finished(self):
+        self.flush_rows()
+        self.csvfile.close()
+        self.run_button.setEnabled(True)
         self.save_button.setEnabled(True)
         self.status_label.setText("Completed")
 
@@ -204,7 +303,7 @@ class PDFExtractorGUI(QWidget):
         dest, _ = QFileDialog.getSaveFileName(self, "Save CSV", filter="CSV Files (*.csv)")
         if dest:
             try:
-                shutil.copy(self.last_csv_path, dest)
+                shutil.copyfile(self.last_csv_path, dest)
                 self.status_label.setText(f"CSV saved to {dest}")
             except Exception as e:
                 self.status_label.setText(f"Error saving CSV: {e}")
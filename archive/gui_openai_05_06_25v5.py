@@ -3,15 +3,18 @@ import os
 import csv
 import shutil
 import re
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 import pdfplumber
 from PySide6.QtWidgets import (
     QApplication, QWidget, QPushButton, QVBoxLayout, QTextEdit,
     QFileDialog, QLabel, QLineEdit, QRadioButton, QHBoxLayout, QProgressBar
 )
-from PySide6.QtCore import Qt, QSettings, QDir
-from PyPDF2 import PdfReader
-from metadata_extractor import extract_metadata, crossref_lookup
+from PySide6.QtCore import Qt, QSettings, QDir, QObject, QThread, Signal, Slot
+from metadata_extractor import extract_metadata, crossref_lookup, positionality_window
 import openai
+from parallel_openai import ParallelProcessor, make_async_client
 
 # Default prompt for positionality extraction
 PROMPT = (
@@ -19,31 +22,305 @@ PROMPT = (
     "If present, briefly summarize in one sentence; if none is present, respond 'No positionality statement found.'"
 )
 
+# First-person sentence for the keyword scan, compiled once; \b keeps "I" from matching
+# inside words like "In" and "we" inside "wire", the period must be on the same line,
+# and the {0,300} cap bounds the scan on malformed text with no sentence breaks
+_FIRST_PERSON_RE = re.compile(r"\b(?:I|[Ww]e|[Mm]y|[Oo]ur)\b[^.\n]{0,300}\.")
+# AI-mode pre-filter: a snippet without a single first-person pronoun can't hold a
+# positionality statement, so it skips the model call (pronoun only, so wrapped lines still count)
+_FIRST_PERSON_WORD_RE = re.compile(r"\b(?:I|[Ww]e|[Mm]y|[Oo]ur)\b")
+
+NO_STATEMENT = "No positionality statement found."
+# Every snippet goes to the cheap model first; only its "Unclear" replies are re-asked of the large one
+FIRST_PASS_MODEL = "gpt-4o-mini"
+ESCALATION_MODEL = "gpt-4o"
+UNCLEAR = "Unclear"
+
+CSV_FIELDS = ["Filename","Title","Author","Journal","Volume","Issue","Found","Statement","Rationale"]
+# Finished rows go to writerows(), and their log lines to the window, this many files at a time
+CSV_BATCH_ROWS = 25
+
+# Snippets sent together in one AI request; 10 x 5000 chars stays well inside the context window
+BATCH_SIZE = 10
+# Batched requests in flight at once (the ParallelProcessor still enforces the RPM/TPM budgets)
+MAX_CONCURRENT_REQUESTS = 20
+
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "positionality_batch",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "articles": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"id": {"type": "string"}, "summary": {"type": "string"}},
+                        "required": ["id", "summary"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["articles"],
+            "additionalProperties": False,
+        },
+    },
+}
+
 # ----------------- Positionality Extraction -----------------
-def extract_positionality_from_pdf(pdf_path, custom_prompt):
+def init_worker(api_key):
+    # Worker processes don't inherit the key typed into the GUI under spawn (macOS/Windows)
+    openai.api_key = api_key
+
+
+def prepare_pdf(path, use_ai):
+    """
+    Pass-1 work for one PDF, run in a worker process (module-level so ProcessPoolExecutor
+    can pickle it): metadata with the Crossref fallback, plus the regex hit (keyword)
+    or the prompt snippet (AI). A PDF that cannot be read comes back as a finished
+    "not found" result carrying the error, so it never takes the pool down with it.
+    """
+    fname = os.path.basename(path)
     try:
-        reader = PdfReader(pdf_path)
-        full_text = " ".join(page.extract_text() or "" for page in reader.pages)
-        snippet = full_text[:5000]
-        messages = [
-            {"role": "system", "content": (
-                "You are an assistant summarizing whether and how an author reflects on their own perspective. "
-                "Look for first-person reflections (I, we, my); if found, summarize why that counts as a positionality statement. "
-                "If none, say 'No positionality statement found.'"
-            )},
-            {"role": "user", "content": f"{custom_prompt}\n\n{snippet}"}
-        ]
-        resp = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            max_tokens=100,
-            temperature=0.0
+        # The front/back page text comes back with the metadata, so neither branch reopens the PDF
+        meta, text = extract_metadata(path, with_text=True)
+    except Exception as e:
+        return {"fname": fname, "meta": {}, "found": False, "stmt": "", "rationale": f"Error reading PDF: {e}"}
+
+    # Crossref fallback
+    if meta.get("title"):
+        try:
+            cr = crossref_lookup(meta["title"])
+            meta["journal"] = meta.get("journal") or (cr.get("container-title") or [""])[0]
+            meta["volume"]  = meta.get("volume")  or cr.get("volume", "")
+            meta["issue"]   = meta.get("issue")   or cr.get("issue", "")
+            if not meta.get("author") and cr.get("author"):
+                names = [f"{a.get('given','')} {a.get('family','')}".strip() for a in cr["author"]]
+                meta["author"] = "; ".join(names)
+        except:
+            pass
+
+    # Positionality detection
+    result = {"fname": fname, "meta": meta}
+    if not use_ai:
+        # Look for first-person reflections
+        m = _FIRST_PERSON_RE.search(text)
+        result["found"] = bool(m)
+        result["stmt"] = m.group(0) if m else ""
+        result["rationale"] = (
+            "Found a first‑person sentence via regex keyword match."
+            if m else
+            "No first‑person sentence matched via regex."
         )
-        return resp.choices[0].message.content.strip()
+    else:
+        # Only the window most likely to hold the statement (at most ~5000 chars) reaches the model
+        snippet = positionality_window(text)
+        if _FIRST_PERSON_WORD_RE.search(snippet):
+            result["snippet"] = snippet
+        else:
+            result["summary"] = NO_STATEMENT
+            result["rationale"] = "No first‑person pronouns in the text, so the AI call was skipped."
+    return result
+
+
+# One fixed system prompt per model, sent first and byte-identical in every request so
+# OpenAI's prompt caching reuses the prefix; the user's prompt goes in the user message
+_SYSTEM_PROMPT = (
+    "You are an assistant summarizing whether and how an author reflects on their own perspective. "
+    "Look for first-person reflections (I, we, my); if found, summarize why that counts as a positionality statement. "
+    "If none, say '{no_statement}' {unclear}"
+    "Reply with one entry per article under \"articles\": its id exactly as given in its ARTICLE header, and the summary."
+)
+SYSTEM_PROMPTS = {
+    FIRST_PASS_MODEL: _SYSTEM_PROMPT.format(no_statement=NO_STATEMENT,
+                                            unclear=f"If you cannot tell, say '{UNCLEAR}'. "),
+    ESCALATION_MODEL: _SYSTEM_PROMPT.format(no_statement=NO_STATEMENT, unclear=""),
+}
+
+
+def batch_request(items, custom_prompt, model=ESCALATION_MODEL):
+    """
+    One chat request for several (id, snippet) pairs, so the instructions and the
+    round trip are paid once per batch. On FIRST_PASS_MODEL the model may answer
+    UNCLEAR, which sends that article on to ESCALATION_MODEL.
+    """
+    body = "\n\n".join(f"--- ARTICLE {item_id} ---\n{snippet}" for item_id, snippet in items)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPTS.get(model, SYSTEM_PROMPTS[ESCALATION_MODEL])},
+        {"role": "user", "content": f"{custom_prompt}\n\n{body}"}
+    ]
+    return {"model": model, "messages": messages, "max_tokens": 100 * len(items),
+            "temperature": 0.0, "response_format": BATCH_RESPONSE_FORMAT}
+
+
+async def extract_positionality_batch(processor, items, custom_prompt, model):
+    """
+    Send one batch_request and return {id: summary}.
+    """
+    try:
+        reply = json.loads(await processor.complete(batch_request(items, custom_prompt, model)))
     except Exception as e:
-        return f"Error extracting positionality: {e}"
+        return {item_id: f"Error extracting positionality: {e}" for item_id, _ in items}
+    summaries = {a["id"]: a["summary"].strip() for a in reply.get("articles", [])}
+    return {item_id: summaries.get(item_id, "Error extracting positionality: missing from batch reply")
+            for item_id, _ in items}
+
+
+async def extract_positionality_batches(api_key, items, custom_prompt):
+    """
+    Send the (id, snippet) items BATCH_SIZE per request to FIRST_PASS_MODEL, then
+    re-send the ones it found UNCLEAR to ESCALATION_MODEL. Each round runs its batches
+    concurrently (at most MAX_CONCURRENT_REQUESTS in flight) over one connection pool;
+    returns the merged {id: summary}.
+    """
+    client = make_async_client(api_key)
+    processor = ParallelProcessor(client)
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def run(batch, model):
+        async with sem:
+            return await extract_positionality_batch(processor, batch, custom_prompt, model)
+
+    async def run_all(items, model):
+        batches = [items[start:start + BATCH_SIZE] for start in range(0, len(items), BATCH_SIZE)]
+        summaries = {}
+        for result in await asyncio.gather(*(run(batch, model) for batch in batches)):
+            summaries.update(result)
+        return summaries
+
+    try:
+        summaries = await run_all(items, FIRST_PASS_MODEL)
+        unclear = [(item_id, snippet) for item_id, snippet in items
+                   if summaries[item_id].startswith(UNCLEAR)]
+        if unclear:
+            summaries.update(await run_all(unclear, ESCALATION_MODEL))
+    finally:
+        await client.close()
+    return summaries
 # ------------------------------------------------------------
 
+class ExtractionWorker(QObject):
+    """
+    Runs both passes and writes the CSV on a background QThread, reporting back via
+    signals, so the window stays responsive without processEvents().
+    """
+    progress = Signal(int, int)
+    status = Signal(str)
+    log = Signal(str)
+    finished = Signal()
+
+    def __init__(self, paths, csv_path, use_ai, prompt, api_key):
+        super().__init__()
+        self.paths = paths
+        self.csv_path = csv_path
+        self.use_ai = use_ai
+        self.prompt = prompt
+        self.api_key = api_key
+
+    @Slot()
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.log.emit(f"❌ Extraction stopped: {e}")
+        finally:
+            # Always hand the window back, even if a pool or the CSV write failed
+            self.finished.emit()
+
+    def _run(self):
+        total = len(self.paths)
+        self.found_count = 0
+        self.rows, self.log_lines = [], []
+
+        with open(self.csv_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+            self.csv_file = f
+            self.writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            self.writer.writeheader()
+
+            # Pass 1 on a process pool (metadata, plus the regex hit or the AI snippet per file);
+            # results come back in folder order, and every file that needs no model call is
+            # written straight away
+            pending = []
+            with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=init_worker,
+                                     initargs=(self.api_key,)) as ex:
+                for i, result in enumerate(ex.map(prepare_pdf, self.paths, [self.use_ai] * total, chunksize=4), start=1):
+                    if "snippet" in result:
+                        pending.append(result)
+                    else:
+                        self._add_row(result)
+                    self.progress.emit(i, total)
+
+            # Pass 2 (AI): BATCH_SIZE snippets per request, all requests in parallel,
+            # for the snippets that passed the first-person pre-filter
+            if pending:
+                self._flush_rows()
+                self.status.emit(f"AI analysis of {len(pending)} PDFs…")
+                items = [(r["fname"], r["snippet"]) for r in pending]
+                try:
+                    summaries = asyncio.run(extract_positionality_batches(self.api_key, items, self.prompt))
+                except Exception as e:
+                    summaries = {item_id: f"Error extracting positionality: {e}" for item_id, _ in items}
+                for r in pending:
+                    r["summary"] = summaries[r["fname"]]
+                    self._add_row(r)
+
+            self._flush_rows()
+
+        # Final summary
+        self.log.emit(f"\n🔄 Extraction complete: {self.found_count}/{total} statements found. CSV saved to {self.csv_path}")
+
+    def _add_row(self, r):
+        """
+        Buffer one finished result's CSV row and log line; both go out CSV_BATCH_ROWS at a time.
+        """
+        if "found" not in r:
+            # AI mode: the verdict is the (model or pre-filter) summary
+            summary = r["summary"]
+            r["found"] = not summary.startswith("No positionality statement found")
+            r["stmt"] = summary if r["found"] else ""
+            r.setdefault("rationale", (
+                "Used AI to generate a one‑sentence summary of the author’s positionality."
+                if r["found"] else
+                "AI scan and regex fallback found no positionality statement."
+            ))
+        fname, meta, found, stmt, rationale = r["fname"], r["meta"], r["found"], r["stmt"], r["rationale"]
+        if found:
+            self.found_count += 1
+
+        self.rows.append({
+            "Filename":   fname,
+            "Title":      meta.get("title",""),
+            "Author":     meta.get("author",""),
+            "Journal":    meta.get("journal",""),
+            "Volume":     meta.get("volume",""),
+            "Issue":      meta.get("issue",""),
+            "Found":      "Yes" if found else "No",
+            "Statement":  stmt,
+            "Rationale":  rationale
+        })
+
+        if found:
+            self.log_lines.append(f"✅ {fname} – {stmt} ({rationale})")
+        else:
+            self.log_lines.append(f"❌ {fname} – No positionality statement found. ({rationale})")
+
+        if len(self.rows) >= CSV_BATCH_ROWS:
+            self._flush_rows()
+
+    def _flush_rows(self):
+        # One writerows() and one log signal per batch, so the text widget reflows once per
+        # CSV_BATCH_ROWS files; flushing the file keeps finished rows if the run is killed
+        if self.rows:
+            self.writer.writerows(self.rows)
+            self.csv_file.flush()
+            self.rows.clear()
+        if self.log_lines:
+            self.log.emit("\n".join(self.log_lines))
+            self.log_lines.clear()
+
+
 class PDFExtractorGUI(QWidget):
     def __init__(self):
         super().__init__()
@@ -63,9 +340,6 @@ class PDFExtractorGUI(QWidget):
         self.api_input.setEchoMode(QLineEdit.Password)
         self.api_input.setPlaceholderText("sk-…")
         self.api_input.setText(self.settings.value("openai_api_key", ""))
-        self.api_input.editingFinished.connect(
-            lambda: self.settings.setValue("openai_api_key", self.api_input.text())
-        )
 
         # Mode radios
         self.keyword_radio = QRadioButton("Keyword Search")
@@ -111,6 +385,12 @@ class PDFExtractorGUI(QWidget):
         self.setLayout(layout)
         self.last_csv_path = None
 
+    def closeEvent(self, event):
+        # The API key is persisted once here rather than on every editingFinished
+        self.settings.setValue("openai_api_key", self.api_input.text())
+        self.settings.sync()
+        super().closeEvent(event)
+
     def choose_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select PDF Folder", self.folder_label.text())
         if folder:
@@ -124,90 +404,40 @@ class PDFExtractorGUI(QWidget):
             self.status_label.setText("Please select a valid folder.")
             return
 
-        fields = ["Filename","Title","Author","Journal","Volume","Issue","Found","Statement","Rationale"]
         csv_path = os.path.join(folder, "output.csv")
         self.last_csv_path = csv_path
+        prompt = self.prompt_input.toPlainText() or PROMPT
+        use_ai = not self.keyword_radio.isChecked()
+        with os.scandir(folder) as entries:
+            pdfs = sorted((e for e in entries if e.is_file() and e.name.lower().endswith(".pdf")),
+                          key=lambda e: e.name)
+        paths = [e.path for e in pdfs]
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fields)
-            writer.writeheader()
-
-            pdfs = [p for p in os.listdir(folder) if p.lower().endswith('.pdf')]
-            total = len(pdfs)
-            found_count = 0
-
-            for i, fname in enumerate(pdfs, start=1):
-                pct = int(i / total * 100)
-                self.progress.setValue(pct)
-                self.progress.setFormat(f"{pct}%")
-                self.status_label.setText(f"{pct}%")
-                QApplication.processEvents()
-
-                path = os.path.join(folder, fname)
-                meta = extract_metadata(path)
-
-                # Crossref fallback
-                if meta.get("title"):
-                    try:
-                        cr = crossref_lookup(meta["title"])
-                        meta["journal"] = meta.get("journal") or (cr.get("container-title") or [""])[0]
-                        meta["volume"]  = meta.get("volume")  or cr.get("volume", "")
-                        meta["issue"]   = meta.get("issue")   or cr.get("issue", "")
-                        if not meta.get("author") and cr.get("author"):
-                            names = [f"{a.get('given','')} {a.get('family','')}".strip() for a in cr["author"]]
-                            meta["author"] = "; ".join(names)
-                    except:
-                        pass
-
-                                # Positionality detection
-                if self.keyword_radio.isChecked():
-                    text = " ".join(page.extract_text() or "" for page in PdfReader(path).pages)
-                    # Look for first-person reflections
-                    m = re.search(r"(I|we).*?\.", text)
-                    found = bool(m)
-                    stmt = m.group(0) if found else ""
-                    rationale = (
-                        "Found a first‑person sentence via regex keyword match."
-                        if found else
-                        "No first‑person sentence matched via regex."
-                    )
-                else:
-                    summary = extract_positionality_from_pdf(path, self.prompt_input.toPlainText() or PROMPT)
-                    if summary.startswith("No positionality statement found"):
-                        found = False
-                        stmt = ""
-                        rationale = "AI scan and regex fallback found no positionality statement."
-                    else:
-                        found = True
-                        stmt = summary
-                        rationale = "Used AI to generate a one‑sentence summary of the author’s positionality."
-
-                if found:
-                    found_count += 1
-
-                # Write CSV row
-                writer.writerow({
-                    "Filename":   fname,
-                    "Title":      meta.get("title",""),
-                    "Author":     meta.get("author",""),
-                    "Journal":    meta.get("journal",""),
-                    "Volume":     meta.get("volume",""),
-                    "Issue":      meta.get("issue",""),
-                    "Found":      "Yes" if found else "No",
-                    "Statement":  stmt,
-                    "Rationale":  rationale
-                })
-
-                # Update GUI log
-                if found:
-                    self.output.append(f"✅ {fname} – {stmt} ({rationale})")
-                else:
-                    self.output.append(f"❌ {fname} – No positionality statement found. ({rationale})")
-
-            # Final summary
-            self.output.append("")
-            self.output.append(f"🔄 Extraction complete: {found_count}/{total} statements found. CSV saved to {csv_path}")
+        self.run_button.setEnabled(False)
+        self.save_button.setEnabled(False)
+        self.progress.setValue(0)
+        self.status_label.setText("0%")
+
+        self.worker_thread = QThread(self)
+        self.worker = ExtractionWorker(paths, csv_path, use_ai, prompt, openai.api_key)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.status.connect(self.status_label.setText)
+        self.worker.log.connect(self.output.append)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.worker_thread.finished.connect(self.on_finished)
+        self.worker_thread.start()
+
+    def on_progress(self, done, total):
+        pct = int(done / total * 100)
+        self.progress.setValue(pct)
+        self.progress.setFormat(f"{pct}%")
+        self.status_label.setText(f"{pct}%")
 
+    def on_finished(self):
+        self.run_button.setEnabled(True)
         self.save_button.setEnabled(True)
         self.status_label.setText("Completed")
 
@@ -215,7 +445,7 @@ class PDFExtractorGUI(QWidget):
         dest, _ = QFileDialog.getSaveFileName(self, "Save CSV", filter="CSV Files (*.csv)")
         if dest:
             try:
-                shutil.copy(self.last_csv_path, dest)
+                shutil.copyfile(self.last_csv_path, dest)
                 self.status_label.setText(f"CSV saved to {dest}")
             except Exception as e:
                 self.status_label.setText(f"Error saving CSV: {e}")
@@ -19,7 +19,7 @@ DEFAULT_PROMPT = (
 )
 
 # ✅ REAL PDF READER LOGIC — place this RIGHT BELOW the DEFAULT_PROMPT
-from PyPDF2 import PdfReader
+from extractor_core import load_pdf_text
 import openai
 
 # Set your API key here (optionally load from env or config for production)
@@ -29,11 +29,17 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 if not openai.api_key:
     raise ValueError("Missing OpenAI API key. Set the OPENAI_API_KEY environment variable.")
 
+# Finished rows are buffered and handed to writerows() this many at a time
+CSV_BATCH_ROWS = 50
+
+# Built once and reused for every file, so all calls share one keep-alive connection pool
+client = openai.OpenAI(api_key=openai.api_key, max_retries=5, timeout=30.0)
+
 
 def get_ai_summary(text):
     try:
         truncated_text = text[:5000]  # Truncate to avoid hitting token limits
-        response = openai.ChatCompletion.create(
+        response = client.chat.completions.create(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are an assistant that identifies and summarizes positionality statements in academic articles."},
@@ -42,17 +48,15 @@ def get_ai_summary(text):
             max_tokens=300,
             temperature=0.5,
         )
-        return response.choices[0].message['content'].strip()
+        return response.choices[0].message.content.strip()
     except Exception as e:
         return f"[Error calling OpenAI API: {e}]"
 
 
 def extract_positionality_from_pdf(pdf_path, custom_prompt):
     try:
-        reader = PdfReader(pdf_path)
-        full_text = ""
-        for page in reader.pages:
-            full_text += page.extract_text() or ""
+        # Only the preview is shown, so stop extracting once there is enough text for it
+        full_text = load_pdf_text(pdf_path, 600)
 
         if not full_text.strip():
             return f"[{os.path.basename(pdf_path)}] No readable text found.\n"
@@ -116,24 +120,29 @@ class PDFExtractorGUI(QWidget):
         output_text = ""
         csv_path = os.path.join(self.selected_directory, "output.csv")
 
-        with open(csv_path, "w", newline='', encoding="utf-8") as csvfile:
+        with open(csv_path, "w", newline='', encoding="utf-8", buffering=1 << 20) as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow(["Filename", "Summary"])  # Header
 
-            for filename in os.listdir(self.selected_directory):
-                if filename.lower().endswith(".pdf"):
-                    pdf_path = os.path.join(self.selected_directory, filename)
-                    try:
-                        with open(pdf_path, "rb") as f:
-                            reader = PdfReader(f)
-                            full_text = "".join([page.extract_text() or "" for page in reader.pages])
-                            summary = get_ai_summary(full_text)
-                            output_text += f"{filename}:\n{summary}\n\n"
-                            writer.writerow([filename, summary])
-                    except Exception as e:
-                        error_msg = f"{filename}: Error - {e}"
-                        output_text += error_msg + "\n"
-                        writer.writerow([filename, error_msg])
+            with os.scandir(self.selected_directory) as entries:
+                pdf_entries = [e for e in entries if e.is_file() and e.name.lower().endswith(".pdf")]
+            rows = []
+            for entry in pdf_entries:
+                filename, pdf_path = entry.name, entry.path
+                try:
+                    # get_ai_summary only sends the first 5000 chars, so stop extracting once they are in
+                    full_text = load_pdf_text(pdf_path, 5000)
+                    summary = get_ai_summary(full_text)
+                    output_text += f"{filename}:\n{summary}\n\n"
+                    rows.append([filename, summary])
+                except Exception as e:
+                    error_msg = f"{filename}: Error - {e}"
+                    output_text += error_msg + "\n"
+                    rows.append([filename, error_msg])
+                if len(rows) >= CSV_BATCH_ROWS:
+                    writer.writerows(rows)
+                    rows.clear()
+            writer.writerows(rows)
 
         if output_text.strip():
             self.output_box.setPlainText(output_text)
@@ -1,8 +1,56 @@
 import os
+import sys
 import csv
 import re
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF for PDF reading
-import openai  # OpenAI API
+
+# The AI modes share parallel_openai/extractor_core with the GUIs in the repo root;
+# they are imported only when one of those modes runs, so keyword mode needs just fitz
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Articles sent together in one AI request (5 x 12,000 chars is ~15k prompt tokens)
+AI_BATCH_SIZE = 5
+AI_TEXT_CHARS = 12000
+# Batched requests in flight at once (the ParallelProcessor still enforces the RPM/TPM budgets)
+MAX_CONCURRENT_REQUESTS = 20
+
+AI_BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "detection_batch",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "articles": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"id": {"type": "string"}, "reply": {"type": "string"}},
+                        "required": ["id", "reply"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["articles"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Metadata and keyword patterns, compiled once at import
+_DOI_RE = re.compile(r'DOI:\s*(10\.\d{4,9}/[-._;()/:A-Z0-9]+)', re.I)
+_JOURNAL_RE = re.compile(r'(Educational Researcher|Journal of [\w\s]+|Review of [\w\s]+)')
+_VOL_ISSUE_RE = re.compile(r'Vol\.\s*(\d+)\s*No\.\s*(\d+)')
+_MONTH_YEAR_RE = re.compile(r'(January|February|March|April|May|June|July|August|September|October|November|December).*\d{4}', re.I)
+_AUTHOR_RE = re.compile(r'([A-Z][a-z]+)\s+([A-Z][a-z]+)')
+
+SEARCH_KEYWORDS = ["positionality", "standpoint", "identity", "reflexivity"]
+# One alternation instead of a str.find per keyword (still substring matches; the earliest hit wins)
+_KEYWORD_RE = re.compile("|".join(re.escape(keyword) for keyword in SEARCH_KEYWORDS), re.I)
 
 def extract_metadata(text):
     lead_author_first = "N/A"
@@ -13,98 +61,243 @@ def extract_metadata(text):
     month_year = "N/A"
     doi = "N/A"
 
-    doi_match = re.search(r'DOI:\s*(10\.\d{4,9}/[-._;()/:A-Z0-9]+)', text, re.I)
+    doi_match = _DOI_RE.search(text)
     if doi_match:
         doi = f"https://doi.org/{doi_match.group(1)}"
 
-    journal_match = re.search(r'(Educational Researcher|Journal of [\w\s]+|Review of [\w\s]+)', text)
+    journal_match = _JOURNAL_RE.search(text)
     if journal_match:
         journal_title = journal_match.group(1)
 
-    vol_issue_match = re.search(r'Vol\.\s*(\d+)\s*No\.\s*(\d+)', text)
+    vol_issue_match = _VOL_ISSUE_RE.search(text)
     if vol_issue_match:
         volume = vol_issue_match.group(1)
         issue = vol_issue_match.group(2)
 
-    month_year_match = re.search(r'(January|February|March|April|May|June|July|August|September|October|November|December).*\d{4}', text, re.I)
+    month_year_match = _MONTH_YEAR_RE.search(text)
     if month_year_match:
         month_year = month_year_match.group(0)
 
-    author_match = re.search(r'([A-Z][a-z]+)\s+([A-Z][a-z]+)', text)
+    author_match = _AUTHOR_RE.search(text)
     if author_match:
         lead_author_first = author_match.group(1)
         lead_author_last = author_match.group(2)
 
     return lead_author_first, lead_author_last, journal_title, volume, issue, month_year, doi
 
-def search_for_keywords(text, keywords):
-    text_lower = text.lower()
-    for keyword in keywords:
-        if keyword.lower() in text_lower:
-            snippet_start = text_lower.find(keyword.lower())
-            snippet = text[max(0, snippet_start-30):snippet_start+100]
-            return "Yes", snippet.strip()
+def search_for_keywords(text):
+    """
+    Single regex scan for the earliest SEARCH_KEYWORDS hit; returns ('Yes', snippet) or ('No', '').
+    """
+    m = _KEYWORD_RE.search(text)
+    if m:
+        snippet = text[max(0, m.start()-30):m.start()+100]
+        return "Yes", snippet.strip()
     return "No", ""
 
-def search_with_ai(text, api_key, model, user_prompt):
+def classify_reply(reply):
+    if "yes" in reply.lower():
+        return "Yes", reply
+    elif "no" in reply.lower():
+        return "No", reply
+    else:
+        return "Unclear", reply
+
+# Sent byte-identical and first in every detection_request, so OpenAI's prompt caching
+# reuses it; the user's question and the article texts follow in the user message
+DETECTION_SYSTEM_PROMPT = (
+    "You are an academic assistant helping to detect specific content in research articles. "
+    "Answer the user's question separately for each article, and reply with one entry per article "
+    "under \"articles\": its id exactly as given in its ARTICLE header, and your reply."
+)
+
+def detection_request(articles, model, user_prompt):
     """
-    Uses OpenAI API to determine if an article matches the user's detection prompt.
-    Returns ('Yes', snippet) or ('No', '').
+    One chat request asking the user's detection question about several (id, text) articles,
+    so the instructions and round trip are shared by the batch.
+    """
+    body = "\n\n".join(f"--- ARTICLE {article_id} ---\n{text[:AI_TEXT_CHARS]}" for article_id, text in articles)
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": DETECTION_SYSTEM_PROMPT},
+            {"role": "user", "content": f"{user_prompt}\n\nHere are the article texts:\n{body}"}
+        ],
+        temperature=0.2,
+        max_tokens=500 * len(articles),
+        response_format=AI_BATCH_RESPONSE_FORMAT
+    )
+
+def parse_detection_reply(articles, content):
+    """
+    Maps a detection_request reply back to {id: ('Yes'|'No'|'Unclear'|'Error', reply)}.
     """
-    openai.api_key = api_key
-
     try:
-        response = openai.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are an academic assistant helping to detect specific content in research articles."},
-                {"role": "user", "content": f"{user_prompt}\n\nHere is the article text:\n{text[:12000]}"}  # Limit to ~12,000 characters
-            ],
-            temperature=0.2,
-            max_tokens=500
-        )
+        replies = {a["id"]: a["reply"].strip() for a in json.loads(content)["articles"]}
+    except (ValueError, KeyError, TypeError) as e:
+        return {article_id: ("Error", f"Unreadable batched reply: {e}") for article_id, _ in articles}
+    return {article_id: classify_reply(replies[article_id]) if article_id in replies
+            else ("Error", "Missing from batched reply")
+            for article_id, _ in articles}
+
+async def search_with_ai(processor, articles, model, user_prompt):
+    """
+    Uses one OpenAI API call to determine whether each (id, text) article matches the
+    user's detection prompt. Returns {id: ('Yes'|'No'|'Unclear'|'Error', reply)}.
+    """
+    try:
+        content = await processor.complete(detection_request(articles, model, user_prompt))
+    except Exception as e:
+        print(f"⚠️ OpenAI API call failed: {e}")
+        return {article_id: ("Error", str(e)) for article_id, _ in articles}
+    return parse_detection_reply(articles, content)
+
+async def search_all_with_ai(batches, api_key, model, user_prompt):
+    """
+    Runs search_with_ai for every batch concurrently over one connection pool,
+    at most MAX_CONCURRENT_REQUESTS at a time. Returns the merged {id: (found, reply)}.
+    """
+    from parallel_openai import ParallelProcessor, make_async_client  # rate-limited AsyncOpenAI calls
 
-        reply = response.choices[0].message.content.strip()
+    client = make_async_client(api_key)
+    processor = ParallelProcessor(client)
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
-        if "yes" in reply.lower():
-            return "Yes", reply
-        elif "no" in reply.lower():
-            return "No", reply
+    async def run(articles):
+        async with sem:
+            return await search_with_ai(processor, articles, model, user_prompt)
+
+    try:
+        results = await asyncio.gather(*(run(articles) for articles in batches))
+    finally:
+        await client.close()
+    answers = {}
+    for result in results:
+        answers.update(result)
+    return answers
+
+async def search_all_with_batch(batches, api_key, model, user_prompt):
+    """
+    Same requests as search_all_with_ai, submitted as one OpenAI Batch API job:
+    half the cost, but the job may take up to 24h. Returns the merged {id: (found, reply)}.
+    """
+    from parallel_openai import make_async_client
+    from extractor_core import BATCH_DONE_STATES, batch_line  # shared Batch API helpers
+
+    client = make_async_client(api_key)
+    lines = [batch_line(f"group-{i}", detection_request(articles, model, user_prompt))
+             for i, articles in enumerate(batches)]
+    contents = {}
+    failure = None
+    try:
+        print(f"📤 Uploading batch of {len(lines)} requests...")
+        batch_file = await client.files.create(
+            file=("requests.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        delay = 10
+        while batch.status not in BATCH_DONE_STATES:
+            print(f"⏳ Batch {batch.id}: {batch.status}...")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 300)
+            batch = await client.batches.retrieve(batch.id)
+
+        if batch.output_file_id:
+            output = await client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                item = json.loads(line)
+                resp = item.get("response") or {}
+                if resp.get("status_code") == 200:
+                    contents[item["custom_id"]] = resp["body"]["choices"][0]["message"]["content"]
+        if batch.status != "completed":
+            failure = f"Batch {batch.status}"
+    except Exception as e:
+        print(f"⚠️ OpenAI Batch API call failed: {e}")
+        failure = str(e)
+    finally:
+        await client.close()
+
+    answers = {}
+    for i, articles in enumerate(batches):
+        content = contents.get(f"group-{i}")
+        if content is None:
+            answers.update({article_id: ("Error", failure or "No batch result") for article_id, _ in articles})
         else:
-            return "Unclear", reply
+            answers.update(parse_detection_reply(articles, content))
+    return answers
 
+def parse_pdf(pdf_path, max_chars=None, until_keyword=False):
+    """
+    Reads one PDF and its regex metadata in a worker process (module-level so
+    ProcessPoolExecutor can pickle it). Returns (text, metadata), or (None, error message).
+    With max_chars, pages past that many characters are never extracted.
+    With until_keyword (keyword mode), extraction stops once the first SEARCH_KEYWORDS hit
+    and its snippet are in, as long as the first AI_TEXT_CHARS (which hold the metadata) are too.
+    """
+    try:
+        parts = []
+        total = 0
+        hit = None  # text offset of the first keyword hit found within a page
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                t = page.get_text()
+                if until_keyword and hit is None:
+                    m = _KEYWORD_RE.search(t)
+                    if m:
+                        hit = total + m.start()
+                parts.append(t)
+                total += len(t)
+                if max_chars is not None and total >= max_chars:
+                    break
+                # search_for_keywords keeps 100 chars after the hit
+                if hit is not None and total >= max(AI_TEXT_CHARS, hit + 100):
+                    break
+        text = "".join(parts)
     except Exception as e:
-        print(f"⚠️ OpenAI API call failed: {e}")
-        return "Error", str(e)
+        return None, str(e)
+    return text, extract_metadata(text)
 
 def process_pdfs(input_folder, output_csv, mode, api_key=None, provider=None, model=None, user_prompt=None):
     """
     Processes PDFs in a folder using either keyword search or AI-based analysis.
     """
-    search_keywords = ["positionality", "standpoint", "identity", "reflexivity"]
     data_rows = []
-
-    for filename in os.listdir(input_folder):
-        if filename.endswith(".pdf"):
-            pdf_path = os.path.join(input_folder, filename)
-            text = ""
-
-            try:
-                doc = fitz.open(pdf_path)
-                for page in doc:
-                    text += page.get_text()
-            except Exception as e:
-                print(f"⚠️ Failed to read {filename}: {e}")
+    pending_ai = []  # (filename, text) waiting for a batched AI call
+
+    with os.scandir(input_folder) as entries:
+        pdfs = sorted((e for e in entries if e.is_file() and e.name.endswith(".pdf")), key=lambda e: e.name)
+    filenames = [e.name for e in pdfs]
+    pdf_paths = [e.path for e in pdfs]
+
+    # The AI modes only send the first AI_TEXT_CHARS (which also hold the metadata),
+    # and keyword mode only reads on until its first hit
+    max_chars = AI_TEXT_CHARS if mode in ("ai", "batch") else None
+    until_keyword = mode == "keyword"
+
+    # Parse on all but one core; map() hands results back in folder order
+    with ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1)) as executor:
+        parsed = executor.map(parse_pdf, pdf_paths, [max_chars] * len(pdf_paths),
+                              [until_keyword] * len(pdf_paths), chunksize=4)
+        for filename, (text, meta) in zip(filenames, parsed):
+            if text is None:
+                print(f"⚠️ Failed to read {filename}: {meta}")
                 continue
 
             if mode == "keyword":
-                found, snippet = search_for_keywords(text, search_keywords)
-            elif mode == "ai":
-                found, snippet = search_with_ai(text, api_key, model, user_prompt)
+                found, snippet = search_for_keywords(text)
+            elif mode in ("ai", "batch"):
+                # Filled in below once the whole folder has been read
+                found, snippet = None, None
+                pending_ai.append((filename, text[:AI_TEXT_CHARS]))
             else:
                 found, snippet = "Error", "Unknown mode selected"
 
-            lead_first, lead_last, journal, volume, issue, month_year, doi = extract_metadata(text)
+            lead_first, lead_last, journal, volume, issue, month_year, doi = meta
 
             row = [
                 filename,
@@ -121,6 +314,14 @@ def process_pdfs(input_folder, output_csv, mode, api_key=None, provider=None, mo
             ]
             data_rows.append(row)
 
+    if pending_ai:
+        batches = [pending_ai[start:start + AI_BATCH_SIZE] for start in range(0, len(pending_ai), AI_BATCH_SIZE)]
+        search_all = search_all_with_batch if mode == "batch" else search_all_with_ai
+        answers = asyncio.run(search_all(batches, api_key, model, user_prompt))
+        for row in data_rows:
+            if row[0] in answers:
+                row[8], row[9] = answers[row[0]]
+
     with open(output_csv, "w", newline="", encoding="utf-8") as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(["Filename", "Lead Author First Name", "Lead Author Last Name", "Journal Title", "Volume", "Issue", "Month/Year", "DOI", "Detected Positionality Statement?", "Snippet/Excerpt", "Notes"])
@@ -151,14 +352,16 @@ if __name__ == "__main__":
     output_path = os.path.join(os.getcwd(), output_filename)
 
     # Mode selection
-    mode = input("Enter mode [keyword, ai]: ") or "keyword"
+    # batch = same as ai, but sent as one OpenAI Batch API job (half price, up to 24h)
+    mode = input("Enter mode [keyword, ai, batch]: ") or "keyword"
 
     api_key = None
     provider = None
     model = None
     user_prompt = None
 
-    if mode.lower() == "ai":
+    mode = mode.lower()
+    if mode in ("ai", "batch"):
         api_key = input("Enter your API key (leave blank to return to keyword mode): ").strip()
         if not api_key:
             print("⚠️ No API key provided. Falling back to keyword mode.\n")
@@ -181,7 +384,7 @@ if __name__ == "__main__":
     print(f"Input folder: {input_folder}")
     print(f"Output file: {output_path}")
     print(f"Mode: {mode}")
-    if mode == "ai":
+    if mode in ("ai", "batch"):
         print(f"Provider: {provider}")
         print(f"Model: {model}")
         print(f"Detection prompt: {user_prompt}")
@@ -0,0 +1,42 @@
+import asyncio
+
+from PySide6.QtCore import QThread, Signal
+
+from extractor_core import COMBINED_TOKEN_BUDGET, DEFAULT_MODEL, process_all, process_all_batch
+
+
+class ExtractionThread(QThread):
+    """
+    Runs the asyncio extraction off the GUI thread so the Qt event loop is never blocked.
+    Shared by every GUI built on extractor_core.
+    """
+    progress = Signal(int)
+    status = Signal(str)
+    row_ready = Signal(object)
+
+    def __init__(self, pdf_paths, api_key, use_ai, prompt, batch=False, model=DEFAULT_MODEL, group_size=1,
+                 text_tokens=COMBINED_TOKEN_BUDGET, parent=None):
+        super().__init__(parent)
+        self.pdf_paths = pdf_paths
+        self.api_key = api_key
+        self.use_ai = use_ai
+        self.prompt = prompt
+        self.batch = batch
+        self.model = model
+        self.group_size = group_size
+        self.text_tokens = text_tokens
+
+    def run(self):
+        if self.batch:
+            job = process_all_batch(self.pdf_paths, self.api_key, self.prompt,
+                                    self.row_ready.emit, self.progress.emit, self.status.emit, self.model,
+                                    self.text_tokens)
+        else:
+            job = process_all(self.pdf_paths, self.api_key, self.use_ai, self.prompt,
+                              self.row_ready.emit, self.progress.emit, self.model, self.group_size,
+                              self.text_tokens)
+        try:
+            asyncio.run(job)
+        except Exception as e:
+            # The thread still finishes (re-enabling Run); say why the run stopped early
+            self.status.emit(f"Extraction stopped: {e}")
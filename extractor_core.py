@@ -0,0 +1,642 @@
+"""
+Shared extraction pipeline for the py-extractor GUIs: PDF parsing, metadata
+routines, OpenAI request builders, and the realtime / Batch API runners.
+No Qt here, so the process-pool workers import it cheaply.
+"""
+import os
+import re
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+from PyPDF2 import PdfReader
+from openai import OpenAIError
+from parallel_openai import CHARS_PER_TOKEN, ParallelProcessor, make_async_client, truncate_to_tokens
+from response_cache import ResponseCache, file_digest, request_key
+from schemas import MetadataModel
+
+# ✅ DEFAULT PROMPT
+DEFAULT_PROMPT = (
+    "In each academic article, identify a positionality statement — a paragraph or explicit passage "
+    "where the author describes aspects of their personal identity, background, experiences, assumptions, "
+    "or biases. These statements typically clarify how the author's identity or experiences have influenced "
+    "the framing, design, or interpretation of the research. Positionality statements often include explicit "
+    "mentions of ethnicity, race, gender, socioeconomic status, educational background, professional role, "
+    "or personal connection to the topic. Detect these statements (or confirm their absence) and extract "
+    "relevant examples to understand how the author situates themselves within the research context."
+)
+
+# Short extractive tasks don't need gpt-4o; gpt-4o-mini is far cheaper and faster.
+# Overridable per run from the Model field in the GUI.
+DEFAULT_MODEL = "gpt-4o-mini"
+# The metadata fallback stays on mini even when a run picks a bigger model for the summaries
+METADATA_MODEL = "gpt-4o-mini"
+
+# Number of async workers sending OpenAI requests, i.e. files talking to the API at once
+MAX_CONCURRENT_REQUESTS = 20
+
+# Parsed-but-not-yet-sent files allowed to queue up between the parse and API stages
+PIPELINE_DEPTH = 32
+
+# Prompts never look past the first few thousand characters, so page
+# extraction stops once this many have been collected
+TEXT_CHAR_BUDGET = 6000
+# Hard page cap for the same scan: image-only pages add no characters, so a scanned
+# 400-page thesis would otherwise be walked end to end without reaching the budget
+TEXT_PAGE_LIMIT = 30
+
+# Prompt text caps, in estimated tokens
+COMBINED_TOKEN_BUDGET = 1250
+METADATA_TOKEN_BUDGET = 375
+GROUP_TOKEN_BUDGET = 750  # per article when several share one request
+
+# Articles sent together in one request when grouping is enabled
+ARTICLES_PER_PROMPT = 8
+
+# GUIs buffer finished rows and hand them to csv writerows() this many at a time
+CSV_BATCH_ROWS = 50
+
+# Bump when the output of process_pdf/process_group changes, so old cached rows are ignored
+RESULT_CACHE_VERSION = 1
+
+# Batch API job states after which polling stops
+BATCH_DONE_STATES = ("completed", "failed", "expired", "cancelled")
+
+# First-page metadata patterns, compiled once at import
+_JOURNAL_VOL_RE = re.compile(r"^(.*Journal.*?)\s*\|\s*Vol\.?\s*(\d+),\s*No\.?\s*(\d+)", re.IGNORECASE | re.MULTILINE)
+_JOURNAL_RE = re.compile(r"Journal[:\s]+([^\n]+)", re.IGNORECASE)
+_VOL_RE = re.compile(r"Volume\s*(\d+)", re.IGNORECASE)
+_ISSUE_RE = re.compile(r"Issue\s*(\d+)", re.IGNORECASE)
+
+# --------------- AI Helper Functions ---------------
+
+# Request builders are shared by the realtime and Batch API paths.
+
+def metadata_request(text, model=METADATA_MODEL):
+    # Sent through the structured-outputs parse() call with MetadataModel as the schema
+    prompt = f"Extract the fields author, journal, volume, issue from this text:\n{truncate_to_tokens(text, METADATA_TOKEN_BUDGET)}"
+    return {"model": model, "messages": [{"role": "user", "content": prompt}], "max_tokens": 100, "temperature": 0.0}
+
+
+# One call returns everything the AI mode needs, instead of separate
+# summary, author and metadata round trips over the same text.
+AI_FIELDS = ("summary", "author", "journal", "volume", "issue")
+AI_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "article_extraction",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {field: {"type": "string"} for field in AI_FIELDS},
+            "required": list(AI_FIELDS),
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+# System prompts are module constants, sent byte-identical and first in every request, so
+# OpenAI's automatic prompt caching can bill the shared prefix at the cached-input rate.
+# Everything that varies (the user's prompt, article text) goes in the user message after it.
+COMBINED_SYSTEM_PROMPT = (
+    "You are an assistant that reads academic articles and returns JSON with these fields: "
+    "summary (a summary of the positionality statement, following the user's prompt), "
+    "author (the author name(s)), journal, volume, issue. Use an empty string for anything not found."
+)
+GROUP_SYSTEM_PROMPT = (
+    "You are an assistant that reads academic articles and returns JSON with one entry per article "
+    "under \"articles\", each with these fields: filename (exactly as given in its ARTICLE header), "
+    "summary (a summary of the positionality statement, following the user's prompt), "
+    "author (the author name(s)), journal, volume, issue. Use an empty string for anything not found."
+)
+
+
+def combined_request(text, custom_prompt=None, model=DEFAULT_MODEL, text_tokens=COMBINED_TOKEN_BUDGET):
+    prompt_content = custom_prompt or DEFAULT_PROMPT
+    truncated = truncate_to_tokens(text, text_tokens)
+    messages = [
+        {"role": "system", "content": COMBINED_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Summarize the positionality statement in the following article using this prompt:\n\n{prompt_content}\n\n{truncated}"}
+    ]
+    return {"model": model, "messages": messages, "max_tokens": 400, "temperature": 0.5,
+            "response_format": AI_RESPONSE_FORMAT}
+
+
+# Grouped variant: several articles behind one copy of the instructions,
+# so the system/user prompt tokens and the round trip are paid once per group.
+GROUP_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "article_group_extraction",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "articles": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {field: {"type": "string"} for field in ("filename",) + AI_FIELDS},
+                        "required": ["filename", *AI_FIELDS],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["articles"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def group_request(articles, custom_prompt=None, model=DEFAULT_MODEL):
+    """
+    One request covering several (filename, text) articles; the reply lists them under "articles".
+    """
+    prompt_content = custom_prompt or DEFAULT_PROMPT
+    body = "\n\n".join(
+        f"--- ARTICLE {filename} ---\n{truncate_to_tokens(text, GROUP_TOKEN_BUDGET)}" for filename, text in articles
+    )
+    messages = [
+        {"role": "system", "content": GROUP_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Summarize the positionality statement in each of the following articles using this prompt:\n\n{prompt_content}\n\n{body}"}
+    ]
+    return {"model": model, "messages": messages, "max_tokens": 400 * len(articles), "temperature": 0.5,
+            "response_format": GROUP_RESPONSE_FORMAT}
+
+
+def extract_text_until(page_texts, min_chars=TEXT_CHAR_BUDGET, max_pages=TEXT_PAGE_LIMIT):
+    """
+    Page texts from the start of the document, stopping once min_chars have been collected
+    or max_pages have been read. page_texts is a lazy iterable, so pages past either limit
+    are never extracted.
+    """
+    pages = []
+    total = 0
+    for text in page_texts:
+        pages.append(text)
+        total += len(text)
+        if total >= min_chars or len(pages) >= max_pages:
+            break
+    return pages
+
+
+def load_pdf(pdf_path, min_chars=TEXT_CHAR_BUDGET):
+    """
+    Parse the PDF once with PyMuPDF and return (info, first_page, text) for every downstream step.
+    text covers only the leading pages up to min_chars characters.
+    PyMuPDF's C text extraction is several times faster than PyPDF2's pure-Python extract_text(),
+    which is only used for files PyMuPDF refuses to open.
+    """
+    try:
+        with fitz.open(pdf_path) as doc:
+            info = doc.metadata or {}
+            pages = extract_text_until((page.get_text() for page in doc), min_chars)
+    except fitz.FileDataError:
+        info, pages = _load_pdf_pypdf2(pdf_path, min_chars)
+    first_page = pages[0] if pages else ""
+    return info, first_page, "".join(pages)
+
+
+def load_pdf_text(pdf_path, min_chars=TEXT_CHAR_BUDGET):
+    """
+    Leading text of the PDF up to min_chars, for callers that need no metadata.
+    Same readers as load_pdf, so every GUI shares the PyMuPDF path and the PyPDF2 fallback.
+    """
+    return load_pdf(pdf_path, min_chars)[2]
+
+
+def _load_pdf_pypdf2(pdf_path, min_chars=TEXT_CHAR_BUDGET):
+    """
+    Fallback reader; returns (info, pages) with info under PyMuPDF's metadata key names.
+    """
+    reader = PdfReader(pdf_path)
+    raw = reader.metadata or {}
+    info = {
+        "title": raw.get("/Title", ""),
+        "author": raw.get("/Author", ""),
+        "creationDate": raw.get("/CreationDate", ""),
+        "producer": raw.get("/Producer", ""),
+    }
+    return info, extract_text_until((page.extract_text() or "" for page in reader.pages), min_chars)
+
+
+def extract_positionality_from_pdf(pdf_path, text):
+    try:
+        if not text.strip():
+            return f"[{os.path.basename(pdf_path)}] No readable text."
+        snippet = text[:500].replace("\n", " ")
+        return snippet + "..."
+    except Exception as e:
+        return f"[{os.path.basename(pdf_path)}] Error: {e}"
+
+
+# --------------- Metadata Extraction Routines ---------------
+
+# Canonical metadata keys, shared by the pdfinfo, regex and AI sources
+METADATA_FIELDS = ("title", "author", "journal", "volume", "issue", "creation_date", "producer")
+
+
+def extract_metadata_pdfinfo(info):
+    return {
+        "title": info.get("title") or "",
+        "author": info.get("author") or "",
+        "creation_date": info.get("creationDate") or "",
+        "producer": info.get("producer") or ""
+    }
+
+
+def extract_metadata_regex(text):
+    meta = {"journal": "", "volume": "", "issue": ""}
+    # Literal prefilter: skip a pattern entirely when its keyword never appears
+    lowered = text.lower()
+    has_journal = "journal" in lowered
+    m = _JOURNAL_VOL_RE.search(text) if has_journal else None
+    if m:
+        meta["journal"] = m.group(1).strip()
+        meta["volume"] = m.group(2)
+        meta["issue"] = m.group(3)
+    else:
+        jm = _JOURNAL_RE.search(text) if has_journal else None
+        if jm: meta["journal"] = jm.group(1).strip()
+        vm = _VOL_RE.search(text) if "volume" in lowered else None
+        if vm: meta["volume"] = vm.group(1)
+        im = _ISSUE_RE.search(text) if "issue" in lowered else None
+        if im: meta["issue"] = im.group(1)
+    return meta
+
+
+async def extract_metadata_ai(processor, text, model=METADATA_MODEL):
+    if processor is None:
+        return {}
+    try:
+        parsed = await processor.parse(metadata_request(text, model), MetadataModel)
+    except OpenAIError:
+        return {}
+    return parsed.model_dump() if parsed is not None else {}
+
+
+async def extract_all_ai(processor, text, custom_prompt=None, model=DEFAULT_MODEL, text_tokens=COMBINED_TOKEN_BUDGET):
+    """
+    Summary, author and journal/volume/issue from a single structured-output call
+    over the first text_tokens of the article.
+    """
+    if processor is None:
+        return {"summary": "[Error: no API key set]"}
+    try:
+        return json.loads(await processor.complete(combined_request(text, custom_prompt, model, text_tokens)))
+    except Exception as e:
+        return {"summary": f"[Error calling OpenAI API: {e}]"}
+
+
+async def extract_group_ai(processor, articles, custom_prompt=None, model=DEFAULT_MODEL):
+    """
+    extract_all_ai for several (filename, text) articles in one call; returns {filename: fields}.
+    """
+    if processor is None:
+        return {filename: {"summary": "[Error: no API key set]"} for filename, _ in articles}
+    try:
+        reply = json.loads(await processor.complete(group_request(articles, custom_prompt, model)))
+    except Exception as e:
+        return {filename: {"summary": f"[Error calling OpenAI API: {e}]"} for filename, _ in articles}
+    return {item.get("filename"): item for item in reply.get("articles", [])}
+
+
+def needs_ai_metadata(meta):
+    return not meta.get("author") or not meta.get("journal") or not meta.get("volume") or not meta.get("issue")
+
+
+def merge_metadata(*sources):
+    """
+    Priority merge of metadata dicts, highest priority first: each METADATA_FIELDS key
+    takes the first non-empty value and defaults to "". Extra keys (e.g. summary) are dropped.
+    """
+    merged = dict.fromkeys(METADATA_FIELDS, "")
+    for field in METADATA_FIELDS:
+        for source in sources:
+            if source.get(field):
+                merged[field] = source[field]
+                break
+    return merged
+
+
+def get_pdf_metadata(info, first_page):
+    """
+    Local metadata only (PDF info dict + first-page regex); AI gaps are filled in by process_pdf.
+    """
+    return merge_metadata(extract_metadata_pdfinfo(info), extract_metadata_regex(first_page))
+
+# --------------- Concurrent Extraction ---------------
+
+def prefetch_pdfs(pdf_paths):
+    """
+    Ask the kernel to start reading every PDF in the background so the parser workers
+    find the pages already cached. No-op where posix_fadvise is unavailable (Windows/macOS).
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in pdf_paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def _extract_pdf_payload(pdf_path, min_chars=TEXT_CHAR_BUDGET):
+    """
+    Parse one PDF in a worker process (module-level so ProcessPoolExecutor can pickle it).
+    Returns (meta, full_text, first_page).
+    """
+    info, first_page, full_text = load_pdf(pdf_path, min_chars)
+    return get_pdf_metadata(info, first_page), full_text, first_page
+
+
+def format_result(filename, meta, author, summary):
+    """
+    Returns (output_text entry, CSV row) for a processed PDF.
+    """
+    entry = (f"{filename}:\n"
+             f"  Title: {meta['title']}\n"
+             f"  Author: {author}\n"
+             f"  Journal: {meta['journal']}\n"
+             f"  Volume: {meta['volume']}\n"
+             f"  Issue: {meta['issue']}\n"
+             f"  CreationDate: {meta['creation_date']}\n"
+             f"  Producer: {meta['producer']}\n"
+             f"Summary: {summary}\n\n")
+    row = [filename, meta['title'], author, meta['journal'], meta['volume'], meta['issue'], meta['creation_date'], meta['producer'], summary]
+    return entry, row
+
+
+def cached_result(filename, fields):
+    """
+    Rebuild (entry, row) from the row fields stored by the result cache (everything but the filename).
+    """
+    title, author, journal, volume, issue, creation_date, producer, summary = fields
+    meta = {"title": title, "journal": journal, "volume": volume, "issue": issue,
+            "creation_date": creation_date, "producer": producer}
+    return format_result(filename, meta, author, summary)
+
+
+def is_cacheable(row):
+    """
+    Only keep rows with a real summary; errors should be retried on the next run.
+    """
+    summary = row[-1]
+    return not summary.startswith("[Error") and ": Error - " not in summary
+
+
+def format_error(filename, error):
+    error_msg = f"{filename}: Error - {error}"
+    return error_msg + "\n", [filename, "", "", "", "", "", "", "", error_msg]
+
+
+async def process_pdf(processor, pdf_path, payload, use_ai, prompt, model=DEFAULT_MODEL,
+                      text_tokens=COMBINED_TOKEN_BUDGET):
+    """
+    Extract metadata and a summary for a single PDF, given the pending
+    _extract_pdf_payload future for it. Returns (output_text entry, CSV row).
+    """
+    filename = os.path.basename(pdf_path)
+    try:
+        meta, full_text, first_page = await payload
+        if use_ai:
+            ai = await extract_all_ai(processor, full_text, prompt, model, text_tokens)
+            meta = merge_metadata(meta, ai)
+            summary = ai.get("summary", "")
+        else:
+            if processor is not None and needs_ai_metadata(meta):
+                meta = merge_metadata(meta, await extract_metadata_ai(processor, first_page))
+            summary = extract_positionality_from_pdf(pdf_path, full_text)
+        return format_result(filename, meta, meta['author'], summary)
+    except Exception as e:
+        return format_error(filename, e)
+
+
+async def process_group(processor, group, prompt, model=DEFAULT_MODEL):
+    """
+    AI-mode counterpart of process_pdf for PDFs sharing one OpenAI call.
+    group is a list of (pdf_path, payload future); returns their (entry, row) pairs in order.
+    """
+    parsed = []
+    for pdf_path, payload in group:
+        filename = os.path.basename(pdf_path)
+        try:
+            meta, full_text, _ = await payload
+            parsed.append((filename, meta, full_text, None))
+        except Exception as e:
+            parsed.append((filename, None, None, e))
+    articles = [(filename, text) for filename, _, text, error in parsed if error is None]
+    answers = await extract_group_ai(processor, articles, prompt, model) if articles else {}
+
+    results = []
+    for filename, meta, _, error in parsed:
+        if error is not None:
+            results.append(format_error(filename, error))
+            continue
+        ai = answers.get(filename, {"summary": "[Error: article missing from grouped reply]"})
+        meta = merge_metadata(meta, ai)
+        results.append(format_result(filename, meta, meta['author'], ai.get("summary", "")))
+    return results
+
+
+async def process_all(pdf_paths, api_key, use_ai, prompt, on_result, on_progress=None, model=DEFAULT_MODEL,
+                      group_size=1, text_tokens=COMBINED_TOKEN_BUDGET):
+    """
+    Process every PDF and pass each (entry, row) to on_result as soon as it finishes.
+    Three overlapping stages: the process pool parses PDFs (at most PIPELINE_DEPTH ahead),
+    MAX_CONCURRENT_REQUESTS workers send the OpenAI calls, and this coroutine drains results.
+    OpenAI calls go through a ParallelProcessor so large folders stay under the RPM/TPM limits.
+    With group_size > 1, AI mode sends that many articles per request (see group_request);
+    otherwise each request carries the first text_tokens of its article.
+    Files whose bytes, prompt, model and mode match an earlier run skip parsing and the API
+    entirely and are served from the ResponseCache results table.
+    """
+    client = make_async_client(api_key) if api_key else None
+    cache = ResponseCache() if client is not None else None
+    processor = ParallelProcessor(client, cache=cache) if client is not None else None
+    settings_key = request_key({"version": RESULT_CACHE_VERSION, "use_ai": use_ai,
+                                "prompt": prompt, "model": model, "text_tokens": text_tokens})
+    min_chars = max(TEXT_CHAR_BUDGET, text_tokens * CHARS_PER_TOKEN)
+    digests = {}  # pdf_path -> content hash, for files that missed the result cache
+    loop = asyncio.get_running_loop()
+    # Queue entries are groups of files, so size the queue to keep ~PIPELINE_DEPTH files ahead
+    parsed = asyncio.Queue(maxsize=max(1, PIPELINE_DEPTH // group_size))
+    results = asyncio.Queue()
+    prefetch_pdfs(pdf_paths)
+
+    async def produce(executor):
+        group = []
+        for pdf_path in pdf_paths:
+            if cache is not None:
+                try:
+                    digest = await loop.run_in_executor(None, file_digest, pdf_path)
+                except OSError:
+                    digest = None  # unreadable; let the parse stage report the error
+                fields = cache.get_result(digest, settings_key) if digest else None
+                if fields is not None:
+                    await results.put(cached_result(os.path.basename(pdf_path), fields))
+                    continue
+                digests[pdf_path] = digest
+            group.append((pdf_path, loop.run_in_executor(executor, _extract_pdf_payload, pdf_path, min_chars)))
+            if len(group) == group_size:
+                await parsed.put(group)
+                group = []
+        if group:
+            await parsed.put(group)
+        for _ in range(MAX_CONCURRENT_REQUESTS):
+            await parsed.put(None)
+
+    async def finish(pdf_path, result):
+        digest = digests.get(pdf_path)
+        if digest and is_cacheable(result[1]):
+            cache.set_result(digest, settings_key, result[1][1:])
+        await results.put(result)
+
+    async def consume():
+        while (group := await parsed.get()) is not None:
+            if use_ai and len(group) > 1:
+                group_results = await process_group(processor, group, prompt, model)
+                for (pdf_path, _), result in zip(group, group_results):
+                    await finish(pdf_path, result)
+            else:
+                for pdf_path, payload in group:
+                    await finish(pdf_path, await process_pdf(processor, pdf_path, payload, use_ai, prompt, model,
+                                                             text_tokens))
+
+    async def next_result(stages):
+        # results.get(), except that a stage dying (e.g. a cache write raising) is re-raised
+        # here at once; otherwise its missing results would leave the drain waiting forever
+        getter = asyncio.ensure_future(results.get())
+        while not getter.done():
+            await asyncio.wait({getter, *stages}, return_when=asyncio.FIRST_COMPLETED)
+            for stage in [stage for stage in stages if stage.done()]:
+                stages.discard(stage)
+                if stage.exception() is not None:
+                    getter.cancel()
+                    raise stage.exception()
+        return getter.result()
+
+    stages = set()
+    try:
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            stages.add(asyncio.create_task(produce(executor)))
+            stages.update(asyncio.create_task(consume()) for _ in range(MAX_CONCURRENT_REQUESTS))
+            for done in range(1, len(pdf_paths) + 1):
+                on_result(await next_result(stages))
+                if on_progress:
+                    on_progress(done)
+            await asyncio.gather(*stages)
+    finally:
+        for stage in stages:
+            stage.cancel()
+        if client is not None:
+            await client.close()
+            cache.close()
+
+
+# --------------- Batch API Extraction ---------------
+
+def batch_line(custom_id, body):
+    return json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+
+
+async def process_all_batch(pdf_paths, api_key, prompt, on_result, on_progress=None, on_status=None,
+                            model=DEFAULT_MODEL, text_tokens=COMBINED_TOKEN_BUDGET):
+    """
+    Submit one combined extraction request per PDF as a single OpenAI Batch API job and wait for it.
+    Half the cost of realtime calls, but the job may take up to 24h to complete.
+    Each (entry, row) is passed to on_result once the job is done, in pdf_paths order.
+    Requests already answered on an earlier run are served from the ResponseCache instead.
+    """
+    on_status = on_status or (lambda msg: None)
+    parsed = []
+    lines = []
+    answers = {}
+    pending = {}  # custom_id -> cache key, for requests actually sent in this batch
+    cache = ResponseCache()
+
+    def queue(custom_id, body):
+        key = request_key(body)
+        cached = cache.get(key)
+        if cached is not None:
+            answers[custom_id] = cached.strip()
+        else:
+            pending[custom_id] = key
+            lines.append(batch_line(custom_id, body))
+
+    loop = asyncio.get_running_loop()
+    prefetch_pdfs(pdf_paths)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        min_chars = max(TEXT_CHAR_BUDGET, text_tokens * CHARS_PER_TOKEN)
+        payloads = [loop.run_in_executor(executor, _extract_pdf_payload, p, min_chars) for p in pdf_paths]
+        for idx, (pdf_path, payload) in enumerate(zip(pdf_paths, payloads), 1):
+            filename = os.path.basename(pdf_path)
+            meta = None
+            try:
+                meta, full_text, first_page = await payload
+                queue(f"ai:{filename}", combined_request(full_text, prompt, model, text_tokens))
+                parsed.append((filename, meta, None))
+            except Exception as e:
+                parsed.append((filename, meta, e))
+            if on_progress:
+                on_progress(idx)
+
+    failure = None
+    if lines:
+        client = make_async_client(api_key)
+        try:
+            on_status(f"Uploading batch of {len(lines)} requests...")
+            batch_file = await client.files.create(
+                file=("requests.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch",
+            )
+            batch = await client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
+            delay = 10
+            while batch.status not in BATCH_DONE_STATES:
+                on_status(f"Batch {batch.id}: {batch.status}...")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 300)
+                batch = await client.batches.retrieve(batch.id)
+
+            if batch.output_file_id:
+                output = await client.files.content(batch.output_file_id)
+                for line in output.text.splitlines():
+                    item = json.loads(line)
+                    resp = item.get("response") or {}
+                    if resp.get("status_code") == 200:
+                        content = resp["body"]["choices"][0]["message"]["content"]
+                        answers[item["custom_id"]] = content.strip()
+                        cache.set(pending[item["custom_id"]], content)
+            if batch.status != "completed":
+                failure = f"[Error: batch {batch.status}]"
+        except Exception as e:
+            failure = f"[Error calling OpenAI Batch API: {e}]"
+        finally:
+            await client.close()
+    cache.close()
+
+    for filename, meta, error in parsed:
+        if error is not None:
+            on_result(format_error(filename, error))
+            continue
+        ai = {}
+        if f"ai:{filename}" in answers:
+            try:
+                ai = json.loads(answers[f"ai:{filename}"])
+            except ValueError:
+                pass
+        meta = merge_metadata(meta, ai)
+        summary = ai.get("summary") or failure or "[Error: no batch result]"
+        on_result(format_result(filename, meta, meta['author'], summary))
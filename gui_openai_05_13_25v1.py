@@ -1,10 +1,14 @@
 # Standard library
 import sys
 import os
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
 import csv
 import shutil
+import re
 from pathlib import Path
-from datetime import date
+from datetime import date, datetime
 
 # Third‑party
 import pdfplumber
@@ -13,12 +17,13 @@ from PySide6.QtWidgets import (
     QFileDialog, QLabel, QLineEdit, QRadioButton, QHBoxLayout,
     QProgressBar, QMessageBox
 )
-from PySide6.QtCore import Qt, QSettings, QDir
-from PyPDF2 import PdfReader
+from PySide6.QtCore import Qt, QSettings, QDir, QTimer, QObject, QThread, Signal, Slot
 import openai
 
 # Your code
-from metadata_extractor import extract_metadata, crossref_lookup
+from metadata_extractor import extract_metadata, crossref_lookup, positionality_window
+from parallel_openai import ParallelProcessor, make_async_client
+from extractor_core import BATCH_DONE_STATES, batch_line
 
 # Default prompt for positionality extraction
 PROMPT = (
@@ -26,31 +31,240 @@ PROMPT = (
     "If present, briefly summarize in one sentence; if none is present, respond 'No positionality statement found.'"
 )
 
+# First-person sentence for the keyword scan, compiled once; \b keeps "I" from matching
+# inside words like "In" and "we" inside "wire", the period must be on the same line,
+# and the {0,300} cap bounds the scan on malformed text with no sentence breaks
+_FIRST_PERSON_RE = re.compile(r"\b(?:I|[Ww]e|[Mm]y|[Oo]ur)\b[^.\n]{0,300}\.")
+
+CSV_FIELDS = ["Filename","Title","Author","Journal","Volume","Issue","Found","Statement","Rationale"]
+
+# Finished rows are buffered and handed to writerows() this many at a time
+CSV_BATCH_ROWS = 50
+
+# OpenAI requests in flight at once (the ParallelProcessor still enforces the RPM/TPM budgets)
+MAX_CONCURRENT_REQUESTS = 20
+
+# Snippets sent together in one realtime request; 15 x 5000 chars stays well inside the context window
+ARTICLES_PER_REQUEST = 15
+
+ARTICLES_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "positionality_batch",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "articles": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"id": {"type": "string"}, "summary": {"type": "string"}},
+                        "required": ["id", "summary"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["articles"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Batch mode checks on the submitted job this often; jobs may take up to 24h
+BATCH_POLL_MS = 60_000
+
 # ----------------- Positionality Extraction -----------------
-def extract_positionality_from_pdf(pdf_path, custom_prompt):
+def init_worker(api_key):
+    # Worker processes don't inherit the key typed into the GUI under spawn (macOS/Windows)
+    openai.api_key = api_key
+
+
+def prepare_pdf(path, use_ai):
+    """
+    Pass-1 work for one PDF, run in a worker process (module-level so ProcessPoolExecutor
+    can pickle it): metadata with the Crossref fallback, plus the regex hit (keyword)
+    or the prompt snippet (AI). A PDF that cannot be read comes back as a finished
+    "not found" result carrying the error, so it never takes the pool down with it.
+    """
+    fname = os.path.basename(path)
     try:
-        reader = PdfReader(pdf_path)
-        full_text = " ".join(page.extract_text() or "" for page in reader.pages)
-        snippet = full_text[:5000]
-        messages = [
-            {"role": "system", "content": (
-                "You are an assistant summarizing whether and how an author reflects on their own perspective. "
-                "Look for first-person reflections (I, we, my); if found, summarize why that counts as a positionality statement. "
-                "If none, say 'No positionality statement found.'"
-            )},
-            {"role": "user", "content": f"{custom_prompt}\n\n{snippet}"}
-        ]
-        resp = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            max_tokens=100,
-            temperature=0.0
+        # Page text comes back with the metadata, so neither mode reopens the PDF
+        meta, text = extract_metadata(path, with_text=True)
+    except Exception as e:
+        return {'fname': fname, 'meta': {}, 'found': False, 'stmt': '', 'rationale': f"Error reading PDF: {e}"}
+
+    # Crossref/DataCite fallback
+    if meta.get('title'):
+        try:
+            cr = crossref_lookup(meta['title'])
+            # merge cr into meta if missing
+            for k in ('journal','volume','issue','author'):
+                if not meta.get(k) and cr.get(k):
+                    meta[k] = cr[k]
+        except:
+            pass
+
+    # Positionality detection
+    result = {'fname': fname, 'meta': meta}
+    if not use_ai:
+        m = _FIRST_PERSON_RE.search(text)
+        result['found'] = bool(m)
+        result['stmt'] = m.group(0) if m else ''
+        result['rationale'] = (
+            "Found a first-person sentence via regex keyword match." if m else
+            "No first-person sentence matched via regex."
         )
-        return resp.choices[0].message.content.strip()
+    else:
+        conf = meta.get('positionality_confidence','low')
+        if meta.get('positionality_tests') and conf in ('medium','high'):
+            result['found'] = True
+            result['rationale'] = f"Positionality detected (confidence={conf})."
+            # Only files whose summary is actually shown go to the model, and only the
+            # window of the text extract_metadata already read that most likely holds it
+            result['snippet'] = positionality_window(text)
+        else:
+            result['found'] = False
+            result['stmt'] = ''
+            result['rationale'] = f"No positionality statement found (confidence={conf})."
+    return result
+
+
+# Fixed system prompts, first in every request so OpenAI's prompt caching reuses the prefix;
+# the user's prompt and the snippets stay in the user message
+POSITIONALITY_SYSTEM_PROMPT = (
+    "You are an assistant summarizing whether and how an author reflects on their own perspective. "
+    "Look for first-person reflections (I, we, my); if found, summarize why that counts as a positionality statement. "
+    "If none, say 'No positionality statement found.'"
+)
+ARTICLES_SYSTEM_PROMPT = (
+    POSITIONALITY_SYSTEM_PROMPT + " "
+    "Reply with one entry per article under \"articles\": its id exactly as given in its ARTICLE header, and the summary."
+)
+
+
+def positionality_request(snippet, custom_prompt):
+    messages = [
+        {"role": "system", "content": POSITIONALITY_SYSTEM_PROMPT},
+        {"role": "user", "content": f"{custom_prompt}\n\n{snippet}"}
+    ]
+    return {"model": "gpt-4o", "messages": messages, "max_tokens": 100, "temperature": 0.0}
+
+
+def articles_request(items, custom_prompt):
+    """
+    One chat request for several (id, snippet) pairs, so the instructions and the
+    round trip are paid once per group instead of once per PDF.
+    """
+    body = "\n\n".join(f"--- ARTICLE {item_id} ---\n{snippet}" for item_id, snippet in items)
+    messages = [
+        {"role": "system", "content": ARTICLES_SYSTEM_PROMPT},
+        {"role": "user", "content": f"{custom_prompt}\n\n{body}"}
+    ]
+    return {"model": "gpt-4o", "messages": messages, "max_tokens": 100 * len(items),
+            "temperature": 0.0, "response_format": ARTICLES_RESPONSE_FORMAT}
+
+
+async def extract_positionality_group(processor, items, custom_prompt):
+    """
+    Send one articles_request and return {id: summary}.
+    """
+    try:
+        reply = json.loads(await processor.complete(articles_request(items, custom_prompt)))
     except Exception as e:
-        return f"Error extracting positionality: {e}"
+        return {item_id: f"Error extracting positionality: {e}" for item_id, _ in items}
+    summaries = {a["id"]: a["summary"].strip() for a in reply.get("articles", [])}
+    return {item_id: summaries.get(item_id, "Error extracting positionality: missing from grouped reply")
+            for item_id, _ in items}
+
+
+async def extract_positionality_all(api_key, items, custom_prompt):
+    """
+    Summarize every (id, snippet) item, ARTICLES_PER_REQUEST per request, with the
+    requests running concurrently (at most MAX_CONCURRENT_REQUESTS in flight) over one
+    AsyncOpenAI connection pool; returns the merged {id: summary}.
+    """
+    client = make_async_client(api_key)
+    processor = ParallelProcessor(client)
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    groups = [items[start:start + ARTICLES_PER_REQUEST] for start in range(0, len(items), ARTICLES_PER_REQUEST)]
+
+    async def run(group):
+        async with sem:
+            return await extract_positionality_group(processor, group, custom_prompt)
+
+    try:
+        results = await asyncio.gather(*(run(group) for group in groups))
+    finally:
+        await client.close()
+    summaries = {}
+    for result in results:
+        summaries.update(result)
+    return summaries
 # ------------------------------------------------------------
 
+class ExtractionWorker(QObject):
+    """
+    Runs pass 1 (process pool) and the realtime AI pass on a background QThread and
+    hands the per-file results back through done, so the window stays responsive
+    without processEvents(). For the Batch API mode the snippets are left for the GUI
+    to submit.
+    """
+    progress = Signal(int)
+    status = Signal(str)
+    done = Signal(list)
+
+    def __init__(self, paths, use_ai, realtime, prompt, api_key):
+        super().__init__()
+        self.paths = paths
+        self.use_ai = use_ai
+        self.realtime = realtime
+        self.prompt = prompt
+        self.api_key = api_key
+
+    @Slot()
+    def run(self):
+        results = []
+        try:
+            self._run(results)
+        except Exception as e:
+            self.status.emit(f"Extraction stopped: {e}")
+            # Whatever was read still gets written; unanswered snippets must not go out as a batch
+            for r in results:
+                r.setdefault('stmt', f"Error extracting positionality: {e}")
+        finally:
+            # Always hand the results (and the Run button) back to the window
+            self.done.emit(results)
+
+    def _run(self, results):
+        total = len(self.paths)
+
+        # Pass 1 on a process pool: metadata plus the keyword hit, or the snippet for the AI pass;
+        # results come back in folder order
+        last_pct = -1
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=init_worker,
+                                 initargs=(self.api_key,)) as ex:
+            for i, result in enumerate(ex.map(prepare_pdf, self.paths, [self.use_ai] * total, chunksize=4), start=1):
+                results.append(result)
+                # Only signal when the bar would actually move (folders of more than 100 PDFs)
+                pct = int(i/total * 100)
+                if pct != last_pct:
+                    self.progress.emit(pct)
+                    last_pct = pct
+
+        # Pass 2 (AI, realtime): ARTICLES_PER_REQUEST snippets per request, all requests in flight together
+        pending = [r for r in results if 'snippet' in r]
+        if pending and self.realtime:
+            self.status.emit(f"AI analysis of {len(pending)} PDFs…")
+            items = [(r['fname'], r['snippet']) for r in pending]
+            try:
+                summaries = asyncio.run(extract_positionality_all(self.api_key, items, self.prompt))
+            except Exception as e:
+                summaries = {item_id: f"Error extracting positionality: {e}" for item_id, _ in items}
+            for r in pending:
+                r['stmt'] = summaries[r['fname']]
+
+
 class PDFExtractorGUI(QWidget):
     def __init__(self):
         super().__init__()
@@ -70,14 +284,12 @@ class PDFExtractorGUI(QWidget):
         self.api_input.setEchoMode(QLineEdit.Password)
         self.api_input.setPlaceholderText("sk-…")
         self.api_input.setText(self.settings.value("openai_api_key", ""))
-        self.api_input.editingFinished.connect(
-            lambda: self.settings.setValue("openai_api_key", self.api_input.text())
-        )
 
         # Mode radios
         self.keyword_radio = QRadioButton("Keyword Search")
         self.ai_radio = QRadioButton("AI Analysis")
         self.ai_radio.setChecked(True)
+        self.batch_radio = QRadioButton("Batch AI (half price, up to 24h)")
 
         # Prompt input
         self.prompt_input = QTextEdit()
@@ -103,6 +315,7 @@ class PDFExtractorGUI(QWidget):
         hbox = QHBoxLayout()
         hbox.addWidget(self.keyword_radio)
         hbox.addWidget(self.ai_radio)
+        hbox.addWidget(self.batch_radio)
         layout = QVBoxLayout()
         layout.addWidget(self.folder_label)
         layout.addWidget(self.select_button)
@@ -118,13 +331,24 @@ class PDFExtractorGUI(QWidget):
         self.setLayout(layout)
         self.last_csv_path = None
 
+        # Batch mode polls the submitted job from the event loop instead of blocking it
+        self.batch_timer = QTimer(self)
+        self.batch_timer.setInterval(BATCH_POLL_MS)
+        self.batch_timer.timeout.connect(self.poll_batch)
+
+    def closeEvent(self, event):
+        # The API key is persisted once here rather than on every editingFinished
+        self.settings.setValue("openai_api_key", self.api_input.text())
+        self.settings.sync()
+        super().closeEvent(event)
+
     def choose_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select PDF Folder", self.folder_label.text())
         if folder:
             self.folder_label.setText(folder)
             self.settings.setValue("last_folder", folder)
 
-        def run_extraction(self):
+    def run_extraction(self):
         # grab API key from GUI
         openai.api_key = self.api_input.text().strip()
 
@@ -140,72 +364,115 @@ class PDFExtractorGUI(QWidget):
         csv_path = desktop / f"positionality_extract_{ts}.csv"
         self.last_csv_path = str(csv_path)
 
-        # Define CSV fields
-        fields = [
-            "Filename","Title","Author","Journal","Volume","Issue",
-            "Found","Statement","Rationale"
-        ]
+        with os.scandir(folder) as entries:
+            pdfs = sorted((e for e in entries if e.is_file() and e.name.lower().endswith(".pdf")),
+                          key=lambda e: e.name)
+        use_ai = not self.keyword_radio.isChecked()
 
-        with open(self.last_csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fields)
-            writer.writeheader()
+        self.run_button.setEnabled(False)
+        self.save_button.setEnabled(False)
+        self.progress.setValue(0)
 
-            pdfs = [p for p in os.listdir(folder) if p.lower().endswith('.pdf')]
-            total = len(pdfs)
-            found_count = 0
+        self.worker_thread = QThread(self)
+        self.worker = ExtractionWorker([entry.path for entry in pdfs], use_ai,
+                                       not self.batch_radio.isChecked(),
+                                       self.prompt_input.toPlainText(), openai.api_key)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.status.connect(self.status_label.setText)
+        self.worker.done.connect(self.on_done)
+        self.worker.done.connect(self.worker_thread.quit)
+        self.worker.done.connect(self.worker.deleteLater)
+        self.worker_thread.finished.connect(self.worker_thread.deleteLater)
+        self.worker_thread.start()
 
-            for i, fname in enumerate(pdfs, start=1):
-                # update progress
-                pct = int(i/total * 100)
-                self.progress.setValue(pct)
-                self.progress.setFormat(f"{pct}%")
-                self.status_label.setText(f"{pct}%")
-                QApplication.processEvents()
-
-                path = os.path.join(folder, fname)
-                meta = extract_metadata(path)
-
-                # Crossref/DataCite fallback
-                if meta.get('title'):
-                    try:
-                        cr = crossref_lookup(meta['title'])
-                        # merge cr into meta if missing
-                        for k in ('journal','volume','issue','author'):
-                            if not meta.get(k) and cr.get(k):
-                                meta[k] = cr[k]
-                    except:
-                        pass
-
-                # Positionality detection
-                if self.keyword_radio.isChecked():
-                    text = " ".join(page.extract_text() or "" for page in PdfReader(path).pages)
-                    m = re.search(r"\b(I|we)\b.*?\.", text)
-                    found = bool(m)
-                    stmt = m.group(0) if found else ''
-                    rationale = (
-                        "Found a first-person sentence via regex keyword match." if found else
-                        "No first-person sentence matched via regex."
-                    )
-                else:
-                    summary = extract_positionality_from_pdf(
-                        path,
-                        self.prompt_input.toPlainText()
-                    )
-                    conf = meta.get('positionality_confidence','low')
-                    if meta.get('positionality_tests') and conf in ('medium','high'):
-                        found = True
-                        stmt = summary
-                        rationale = f"Positionality detected (confidence={conf})."
-                    else:
-                        found = False
-                        stmt = ''
-                        rationale = f"No positionality statement found (confidence={conf})."
+    def on_progress(self, pct):
+        self.progress.setValue(pct)
+        self.progress.setFormat(f"{pct}%")
+        self.status_label.setText(f"{pct}%")
+
+    def on_done(self, results):
+        # Batch mode: the snippets the worker left unanswered go out as one Batch API job,
+        # whose results arrive via poll_batch
+        pending = [r for r in results if 'snippet' in r and 'stmt' not in r]
+        if pending:
+            self.submit_batch(results, pending)
+            return
+        self.write_results(results)
 
+    def submit_batch(self, results, pending):
+        """
+        Upload one positionality_request per pending PDF (custom_id = filename) as a
+        Batch API job; poll_batch finishes the run once the job is done.
+        """
+        prompt = self.prompt_input.toPlainText()
+        lines = [batch_line(r['fname'], positionality_request(r['snippet'], prompt)) for r in pending]
+        try:
+            client = openai.OpenAI(api_key=openai.api_key, max_retries=5, timeout=30.0)
+            batch_file = client.files.create(
+                file=("requests.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch",
+            )
+            batch = client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
+        except Exception as e:
+            for r in pending:
+                r['stmt'] = f"Error calling OpenAI Batch API: {e}"
+            self.write_results(results)
+            return
+        self.batch_client = client
+        self.batch_id = batch.id
+        self.batch_results = results
+        self.batch_pending = pending
+        self.status_label.setText(f"Batch {batch.id}: {batch.status}…")
+        self.batch_timer.start()
+
+    def poll_batch(self):
+        try:
+            batch = self.batch_client.batches.retrieve(self.batch_id)
+        except Exception as e:
+            # Transient; try again on the next tick
+            self.status_label.setText(f"Batch {self.batch_id}: status check failed ({e}), retrying…")
+            return
+        if batch.status not in BATCH_DONE_STATES:
+            self.status_label.setText(f"Batch {batch.id}: {batch.status}…")
+            return
+        self.batch_timer.stop()
+
+        summaries = {}
+        try:
+            if batch.output_file_id:
+                content = self.batch_client.files.content(batch.output_file_id)
+                for line in content.text.splitlines():
+                    item = json.loads(line)
+                    resp = item.get("response") or {}
+                    if resp.get("status_code") == 200:
+                        summaries[item["custom_id"]] = resp["body"]["choices"][0]["message"]["content"].strip()
+        except Exception as e:
+            self.output.append(f"⚠️ Could not download batch results: {e}")
+        for r in self.batch_pending:
+            r['stmt'] = summaries.get(r['fname'], f"Error extracting positionality: batch {batch.status}")
+        self.batch_client.close()
+        self.write_results(self.batch_results)
+
+    def write_results(self, results):
+        found_count = 0
+        with open(self.last_csv_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            rows = []
+
+            for r in results:
+                fname, meta, found = r['fname'], r['meta'], r['found']
                 if found:
                     found_count += 1
 
-                # write CSV row
-                writer.writerow({
+                # buffer the CSV row; written CSV_BATCH_ROWS at a time
+                rows.append({
                     'Filename': fname,
                     'Title': meta.get('title',''),
                     'Author': meta.get('author',''),
@@ -213,19 +480,27 @@ class PDFExtractorGUI(QWidget):
                     'Volume': meta.get('volume',''),
                     'Issue': meta.get('issue',''),
                     'Found': 'Yes' if found else 'No',
-                    'Statement': stmt,
-                    'Rationale': rationale,
+                    'Statement': r['stmt'],
+                    'Rationale': r['rationale'],
                 })
+                if len(rows) >= CSV_BATCH_ROWS:
+                    writer.writerows(rows)
+                    rows.clear()
 
                 # update debug log in GUI
                 icon = '✅' if found else '❌'
-                self.output.append(f"{icon} {fname} – {rationale}")
+                self.output.append(f"{icon} {fname} – {r['rationale']}")
 
-            # final summary
-            self.output.append('')
-            self.output.append(
-                f"🔄 Extraction complete: {found_count}/{total} statements found. CSV saved to {self.last_csv_path}"
-            )
+            writer.writerows(rows)
+
+        # final summary
+        self.output.append('')
+        self.output.append(
+            f"🔄 Extraction complete: {found_count}/{len(results)} statements found. CSV saved to {self.last_csv_path}"
+        )
+        self.status_label.setText("Completed")
+        self.save_button.setEnabled(True)
+        self.run_button.setEnabled(True)
 
     def save_csv(self):
         # Suggest ~/Desktop/positionality_extract_YYYYMMDD_HHMMSS.csv
@@ -243,7 +518,7 @@ class PDFExtractorGUI(QWidget):
             return  # user cancelled
 
         try:
-            shutil.copy(self.last_csv_path, dest)
+            shutil.copyfile(self.last_csv_path, dest)
             self.status_label.setText(f"CSV saved to {dest}")
         except Exception as e:
             self.status_label.setText(f"Error saving CSV: {e}")
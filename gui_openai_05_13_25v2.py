@@ -1,31 +1,33 @@
 # Standard library
 import sys
 import os
+import asyncio
 import csv
+import json
 import re
 import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import date, datetime
-from metadata_extractor import extract_metadata
 
 # Third‑party
 import pdfplumber
 from PySide6.QtWidgets import (
     QApplication, QWidget, QPushButton, QVBoxLayout, QTextEdit,
     QFileDialog, QLabel, QLineEdit, QRadioButton, QHBoxLayout,
-    QProgressBar, QMessageBox
+    QProgressBar, QMessageBox, QCheckBox
 )
-from PySide6.QtGui import QMovie
-from PySide6.QtCore import Qt, QSettings, QDir, QSize, QTimer
-from PyPDF2 import PdfReader
+from PySide6.QtCore import Qt, QSettings, QDir, QSize, QTimer, QObject, QThread, Signal, Slot
 import openai
-from openai import OpenAI
-# …rest of your imports
-client = OpenAI()
-
 
 # Your code
-from metadata_extractor import extract_metadata, crossref_lookup
+from metadata_extractor import (
+    apply_positionality, collect_positionality_requests,
+    extract_metadata_all, extract_metadata_local, positionality_from_replies,
+)
+from extractor_core import BATCH_DONE_STATES, batch_line
+from response_cache import request_key
 
 # Default prompt for positionality extraction
 PROMPT = (
@@ -33,6 +35,169 @@ PROMPT = (
     "If present, briefly summarize in one sentence; if none is present, respond 'No positionality statement found.'"
 )
 
+CSV_FIELDS = ["Filename","Title","Author","Journal","Volume","Issue","Found","Statement","Rationale"]
+
+# Rows are streamed to a temp CSV as they finish; flushed to disk this often
+CSV_FLUSH_ROWS = 10
+
+# How often a submitted Batch API job is checked on
+BATCH_POLL_MS = 30_000
+
+
+def list_pdfs(folder):
+    # scandir yields ready-made paths and cached d_type, no extra join/stat per entry; sorted once by name
+    with os.scandir(folder) as entries:
+        return sorted((e.path for e in entries if e.is_file() and e.name.lower().endswith(".pdf")),
+                      key=os.path.basename)
+
+def build_row(path, meta, error=None):
+    """
+    The CSV row for one PDF: metadata, positionality verdict and the best snippet.
+    """
+    fname = os.path.basename(path)
+    if error is not None:
+        meta = {}
+    tests = meta.get("positionality_tests", [])
+    conf  = meta.get("positionality_confidence", "low")
+    snippets = meta.get("positionality_snippets") or {}
+
+    # pick the best snippet to show
+    if "gpt_full_text" in snippets:
+        summary = snippets["gpt_full_text"]
+    elif "header" in snippets:
+        summary = snippets["header"]
+    elif "tail" in snippets:
+        summary = snippets.get("tail", "")
+    else:
+        summary = ""
+    # for GUI row output:
+    stmt = summary
+
+    found = bool(tests)
+    if error is not None:
+        rationale = f"Error: {error}"
+    elif found:
+        rationale = f"Positionality detected (confidence={conf})."
+    else:
+        rationale = f"No positionality statement found (confidence={conf})."
+
+    return {
+        "Filename":  fname,
+        "Title":     meta.get("title",""),
+        "Author":    meta.get("author",""),
+        "Journal":   meta.get("journal",""),
+        "Volume":    meta.get("volume",""),
+        "Issue":     meta.get("issue",""),
+        "Found":     "Yes" if found else "No",
+        "Statement": stmt,
+        "Rationale": rationale,
+    }
+
+
+def prepare_pdf(path):
+    """
+    Batch mode, first stage: local metadata (DOI/Crossref fill-ins included), the page text and
+    the positionality requests the batch must answer for one PDF.
+    Returns (meta, page_texts, requests, error).
+    """
+    try:
+        meta, page_texts = extract_metadata_local(path)
+        return meta, page_texts, collect_positionality_requests(page_texts), None
+    except Exception as e:
+        return {}, [], [], str(e)
+
+
+class BatchPrepWorker(QObject):
+    """
+    Batch mode's local stage on a background QThread: prepare_pdf over every PDF
+    (a process per core, folder order), handed back through done as
+    [(path, meta, page_texts, requests, error)].
+    """
+    progress = Signal(int)
+    done = Signal(list)
+
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = paths
+
+    @Slot()
+    def run(self):
+        prepared = []
+        last_pct = -1
+        try:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                results = executor.map(prepare_pdf, self.paths, chunksize=4)
+                for i, (path, result) in enumerate(zip(self.paths, results), start=1):
+                    prepared.append((path, *result))
+                    pct = int(i / len(self.paths) * 100)
+                    if pct != last_pct:
+                        self.progress.emit(pct)
+                        last_pct = pct
+        except Exception as e:
+            # e.g. BrokenProcessPool after a parser crash: every file not yet read gets an error row
+            prepared += [(path, {}, [], [], f"not read ({e})") for path in self.paths[len(prepared):]]
+        finally:
+            self.done.emit(prepared)
+
+
+class ExtractionWorker(QObject):
+    """
+    Runs the extraction on a background QThread and reports back via signals, so the
+    window stays responsive without processEvents(). PDFs are processed concurrently
+    (extract_metadata_all); rows are streamed to csv_path in folder order.
+    """
+    progress = Signal(int)
+    row = Signal(dict)
+    log = Signal(str)
+    done = Signal(int, int)
+
+    def __init__(self, paths, csv_path, api_key, use_cache=True):
+        super().__init__()
+        self.paths = paths
+        self.csv_path = csv_path
+        self.api_key = api_key
+        self.use_cache = use_cache
+
+    @Slot()
+    def run(self):
+        self.found_count = 0
+        self.finished_count = 0
+        self.last_pct = -1
+        self.next_index = 0
+        self.waiting = {}  # rows finished ahead of an earlier file, by index
+        try:
+            with open(self.csv_path, "w", newline="", encoding="utf-8") as csvfile:
+                self.csvfile = csvfile
+                self.writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS)
+                self.writer.writeheader()
+                asyncio.run(extract_metadata_all(self.paths, self.api_key, self._on_result,
+                                                 use_cache=self.use_cache))
+        except Exception as e:
+            self.log.emit(f"❌ Extraction stopped: {e}")
+        finally:
+            # Always hand the Run button back, with the count reached so far
+            self.done.emit(self.found_count, len(self.paths))
+
+    def _on_result(self, index, meta, error):
+        self.finished_count += 1
+        pct = int(self.finished_count / len(self.paths) * 100)
+        if pct != self.last_pct:
+            self.progress.emit(pct)
+            self.last_pct = pct
+
+        # Stream each row to the CSV, then hand it to the GUI's log, once every earlier file is done
+        self.waiting[index] = build_row(self.paths[index], meta, error)
+        while self.next_index in self.waiting:
+            row = self.waiting.pop(self.next_index)
+            self.next_index += 1
+            self.writer.writerow(row)
+            if self.next_index % CSV_FLUSH_ROWS == 0:
+                self.csvfile.flush()
+            if row["Found"] == "Yes":
+                self.found_count += 1
+            self.row.emit(row)
+
+
 class PDFExtractorGUI(QWidget):
     def __init__(self):
         super().__init__()
@@ -93,6 +258,14 @@ class PDFExtractorGUI(QWidget):
         """)
         layout.addWidget(self.prompt_input)
 
+        # Batch API mode: half the cost, results within 24h (usually minutes)
+        self.batch_checkbox = QCheckBox("Batch mode (half price, results within 24h)")
+        layout.addWidget(self.batch_checkbox)
+
+        # Unchanged PDFs normally reuse their results from the last run
+        self.rebuild_checkbox = QCheckBox("Force rebuild (ignore cached results)")
+        layout.addWidget(self.rebuild_checkbox)
+
         # Run button
         self.run_button = QPushButton("Run Extraction")
         self.run_button.clicked.connect(self.run_extraction)
@@ -104,11 +277,6 @@ class PDFExtractorGUI(QWidget):
         layout.addWidget(self.progress)
         layout.addWidget(self.status_label)
 
-        # Spinner label (emoji‑based)
-        #self.spinner_label = QLabel("")
-        #layout.addWidget(self.spinner_label)
-        #self.spinner_label.hide()
-
         # Output (debug) window
         self.output = QTextEdit()
         self.output.setReadOnly(True)
@@ -123,23 +291,17 @@ class PDFExtractorGUI(QWidget):
         # finalize
         self.setLayout(layout)
 
-        # --- SPINNER TIMER SETUP ---
-        self._spin_frames = ["⏳", ""]
-        self._sin_idx    = 0
-        self._spin_timer  = QTimer(self)
-        self._spin_timer.setInterval(500)
-        self._spin_timer.timeout.connect(self._spin)
+        # rows stream to this temp CSV during a run; save_csv copies it
+        self.last_csv_path = None
 
-        # initialise storage
-        self.fieldnames   = []
-        self.rows         = []
+        # Batch mode polls the submitted job from the GUI thread
+        self.batch_timer = QTimer(self)
+        self.batch_timer.setInterval(BATCH_POLL_MS)
+        self.batch_timer.timeout.connect(self.poll_batch)
+        # A job still running when the window was closed is picked up again
+        if self.settings.value("batch_id"):
+            QTimer.singleShot(0, self.resume_batch)
 
-    def _spin(self):
-        # flip between hourglass and blank
-        self.spinner_label.setText(self._spin_frames[self._spin_idx])
-        self._spin_idx = (self._spin_idx + 1) % len(self._spin_frames)
-
-    
     def choose_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select PDF Folder", self.folder_label.text())
         if folder:
@@ -163,104 +325,192 @@ class PDFExtractorGUI(QWidget):
             self.status_label.setText("Please select a valid folder.")
             return
     
-        # 1) Define CSV fields & init in-memory storage
-        fields = [
-            "Filename","Title","Author","Journal","Volume","Issue",
-            "Found","Statement","Rationale"
-        ]
-        self.fieldnames = fields
-        self.rows = []
-    
-        # 2) Gather the PDF list and set up counters
-        pdfs = [p for p in os.listdir(folder) if p.lower().endswith(".pdf")]
-        total = len(pdfs)
-        found_count = 0
-    
-        # 3) Main loop over each PDF
-        for i, fname in enumerate(pdfs, start=1):
-            # actual extraction begins here
-            path = os.path.join(folder, fname)
-            meta = extract_metadata(path)
-
-            # Crossref/DataCite fallback
-            if meta.get('title'):
-                try:
-                    cr = crossref_lookup(meta['title'])
-                    for k in ('journal','volume','issue','author'):
-                        if not meta.get(k) and cr.get(k):
-                            meta[k] = cr[k]
-                except:
-                    pass
-
-            meta = extract_metadata(path)
-            tests = meta.get("positionality_tests", [])
-            conf  = meta.get("positionality_confidence", "low")
-            snippets = meta.get("positionality_snippets") or {}
-
-            # pick the best snippet to show
-            if "gpt_full_text" in snippets:
-                summary = snippets["gpt_full_text"]
-            elif "header" in snippets:
-                summary = snippets["header"]
-            elif "tail" in snippets:
-                summary = snippets.get("tail", "")
-            else:
-                summary = ""
-            # for GUI row output:
-            stmt = summary
-
-            found = bool(tests)
-            rationale = (
-                f"Positionality detected (confidence={conf})."
-                if found else
-                f"No positionality statement found (confidence={conf})."
-            )
-                
-            # 4) Append to in-memory rows
-            self.rows.append({
-                "Filename":  fname,
-                "Title":     meta.get("title",""),
-                "Author":    meta.get("author",""),
-                "Journal":   meta.get("journal",""),
-                "Volume":    meta.get("volume",""),
-                "Issue":     meta.get("issue",""),
-                "Found":     "Yes" if found else "No",
-                "Statement": stmt,
-                "Rationale": rationale,
-            })
-    
-            # 5) Update found counter
-            if found:
-                found_count += 1
-    
-            # 6) Update debug log in the GUI
-            icon = "✅" if found else "❌"
-            self.output.append(f"{icon} {fname} – {rationale}")
-    
-            # 7) Update progress bar (if not already in your logic)
-            pct = int(i / total * 100)
-            self.progress.setValue(pct)
-            QApplication.processEvents()
+        # 1) Gather the PDF list
+        paths = list_pdfs(folder)
 
-    
-        # 8) After loop, stop spinner & show final summary
-        #self._spin_timer.stop()
-        #self.spinner_label.hide()
+        # 2) Rows stream to a temp CSV: constant memory, and flushed rows survive a crash
+        self._new_temp_csv()
+
+        if self.batch_checkbox.isChecked():
+            self.start_batch(paths)
+            return
+
+        # 3) The loop runs on a worker thread; its signals drive the log and progress bar.
+        worker = ExtractionWorker(paths, self.last_csv_path, api_key,
+                                  use_cache=not self.rebuild_checkbox.isChecked())
+        worker.progress.connect(self._on_progress)
+        worker.row.connect(self._append_row)
+        worker.log.connect(self.output.append)
+        worker.done.connect(self.on_done)
+        self._start_worker(worker, worker.done)
+
+    def _new_temp_csv(self):
+        # One temp CSV per run; the previous run's is deleted rather than left in /tmp
+        self._remove_temp_csv()
+        fd, self.last_csv_path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+
+    def _remove_temp_csv(self):
+        if self.last_csv_path is not None:
+            try:
+                os.remove(self.last_csv_path)
+            except OSError:
+                pass
+            self.last_csv_path = None
+
+    def closeEvent(self, event):
+        self._remove_temp_csv()
+        super().closeEvent(event)
+
+    def _start_worker(self, worker, done):
+        # Named worker_thread, not thread, so QObject.thread() stays intact.
+        # Until the first file finishes the bar is Qt's native busy indicator (range 0..0)
+        self.progress.setRange(0, 0)
+        self.worker = worker
+        self.worker_thread = QThread(self)
+        worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(worker.run)
+        done.connect(self.worker_thread.quit)
+        done.connect(worker.deleteLater)
+        self.worker_thread.finished.connect(self.worker_thread.deleteLater)
+        self.worker_thread.start()
+
+    def _on_progress(self, pct):
+        if self.progress.maximum() == 0:
+            self.progress.setRange(0, 100)
+        self.progress.setValue(pct)
+
+    def start_batch(self, paths, batch_id=None):
+        """
+        Batch mode: parse the PDFs on a worker thread, then submit their model requests as
+        one Batch API job, or with batch_id resume polling a job from an earlier session.
+        """
+        self.batch_id = batch_id
+        self.status_label.setText("Reading PDFs…")
+        worker = BatchPrepWorker(paths)
+        worker.progress.connect(self._on_progress)
+        worker.done.connect(self.on_prepared)
+        self._start_worker(worker, worker.done)
+
+    def resume_batch(self):
+        folder = self.settings.value("batch_folder", "")
+        if not os.path.isdir(folder):
+            self._forget_batch()
+            return
+        batch_id = self.settings.value("batch_id")
+        self.output.append(f"Resuming batch {batch_id} for {folder}…")
+        self.run_button.setEnabled(False)
+        openai.api_key = self.api_input.text().strip()
+        self._new_temp_csv()
+        self.start_batch(list_pdfs(folder), batch_id)
+
+    def _forget_batch(self):
+        self.settings.remove("batch_id")
+        self.settings.remove("batch_folder")
+
+    def on_prepared(self, prepared):
+        """
+        Submit every distinct request as one JSONL Batch API job (custom_id = request_key,
+        so identical requests from different PDFs are asked once), then start polling.
+        """
+        self.batch_prepared = prepared
+        self.batch_client = openai.OpenAI(api_key=openai.api_key, max_retries=5, timeout=30.0)
+        if self.batch_id is None:
+            lines = {}
+            for path, meta, page_texts, requests, error in prepared:
+                for request in requests:
+                    key = request_key(request)
+                    lines.setdefault(key, batch_line(key, request))
+            if not lines:
+                self.finish_batch({})
+                return
+            try:
+                batch_file = self.batch_client.files.create(
+                    file=("requests.jsonl", "\n".join(lines.values()).encode("utf-8")),
+                    purpose="batch",
+                )
+                batch = self.batch_client.batches.create(
+                    input_file_id=batch_file.id,
+                    endpoint="/v1/chat/completions",
+                    completion_window="24h",
+                )
+            except Exception as e:
+                self.output.append(f"⚠️ Could not submit batch: {e}")
+                self.finish_batch({}, "not submitted")
+                return
+            self.batch_id = batch.id
+            self.settings.setValue("batch_id", batch.id)
+            self.settings.setValue("batch_folder", self.folder_label.text())
+        self.status_label.setText(f"Batch {self.batch_id}: submitted, checking every {BATCH_POLL_MS // 1000}s…")
+        # No progress to report while the job runs; show the busy indicator instead
+        self.progress.setRange(0, 0)
+        self.batch_timer.start()
+
+    def poll_batch(self):
+        try:
+            batch = self.batch_client.batches.retrieve(self.batch_id)
+        except Exception as e:
+            # Transient; try again on the next tick
+            self.status_label.setText(f"Batch {self.batch_id}: status check failed ({e}), retrying…")
+            return
+        if batch.status not in BATCH_DONE_STATES:
+            self.status_label.setText(f"Batch {batch.id}: {batch.status}…")
+            return
+        self.batch_timer.stop()
+
+        replies = {}
+        try:
+            if batch.output_file_id:
+                content = self.batch_client.files.content(batch.output_file_id)
+                for line in content.text.splitlines():
+                    item = json.loads(line)
+                    resp = item.get("response") or {}
+                    if resp.get("status_code") == 200:
+                        replies[item["custom_id"]] = resp["body"]["choices"][0]["message"]["content"]
+        except Exception as e:
+            self.output.append(f"⚠️ Could not download batch results: {e}")
+        self.finish_batch(replies, batch.status)
+
+    def finish_batch(self, replies, status="completed"):
+        """
+        Replay each PDF's positionality scan against the batch replies and write the CSV.
+        """
+        self._forget_batch()
+        self.batch_client.close()
+        found_count = 0
+        with open(self.last_csv_path, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for path, meta, page_texts, requests, error in self.batch_prepared:
+                if error is None:
+                    try:
+                        apply_positionality(meta, positionality_from_replies(page_texts, replies))
+                    except KeyError:
+                        error = f"no batch answer (batch {status})"
+                row = build_row(path, meta, error)
+                writer.writerow(row)
+                if row["Found"] == "Yes":
+                    found_count += 1
+                self._append_row(row)
+        self.on_done(found_count, len(self.batch_prepared))
+
+    def _append_row(self, row):
+        # Update debug log in the GUI
+        icon = "✅" if row["Found"] == "Yes" else "❌"
+        self.output.append(f"{icon} {row['Filename']} – {row['Rationale']}")
+
+    def on_done(self, found_count, total):
+        self.progress.setRange(0, 100)
+        self.progress.setValue(100)
+        # Show final summary
         self.status_label.setText("Done.")
-        self.run_button.setEnabled(True)
         self.output.append("")
         self.output.append(
             f"🔄 Extraction complete: {found_count}/{total} statements found."
         )
-        
-        # 9) Stop spinner animation
-        #self._spin_timer.stop()
-        #self.spinner_label.hide()
 
-        # 10) Enable Save button now that we have rows
+        # Enable Save now that the CSV is complete, and allow another run
         self.save_button.setEnabled(True)
-        
-        # 11) Insert run_button re‑enable here
         self.run_button.setEnabled(True)
 
     def save_csv(self):
@@ -279,11 +529,7 @@ class PDFExtractorGUI(QWidget):
             return  # user cancelled
 
         try:
-            with open(dest, "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
-                writer.writeheader()
-                writer.writerows(self.rows)
-
+            shutil.copyfile(self.last_csv_path, dest)
             self.status_label.setText(f"CSV saved to {dest}")
         except Exception as e:
             self.status_label.setText(f"Error saving CSV: {e}")
@@ -1,14 +1,61 @@
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QLineEdit,
-    QTextEdit, QVBoxLayout, QFileDialog, QProgressBar
+    QTextEdit, QVBoxLayout, QFileDialog, QProgressBar, QCheckBox
 )
-from PySide6.QtCore import QSettings, Qt
+from PySide6.QtCore import QSettings, Qt, QObject, QThread, Signal, Slot
 import openai
 import sys
 import os
+import asyncio
 import csv
+import shutil
+import tempfile
 from datetime import datetime
-from metadata_extractor import extract_metadata
+from metadata_extractor import extract_metadata_all
+
+CSV_HEADER = ["Filename", "Detected", "Confidence", "Snippet"]
+# Rows are streamed to a temp CSV as they finish; flushed to disk this often
+CSV_FLUSH_ROWS = 10
+
+
+class ExtractionWorker(QObject):
+    """
+    Runs extract_metadata_all over the PDFs on a background QThread and reports back via
+    signals, so API stalls never freeze the window. PDFs are processed concurrently and
+    reported in the order they finish.
+    """
+    progress = Signal(int, int)
+    row_ready = Signal(dict)
+    log = Signal(str)
+    finished = Signal()
+
+    def __init__(self, paths, api_key, use_cache=True):
+        super().__init__()
+        self.paths = paths
+        self.api_key = api_key
+        self.use_cache = use_cache
+
+    @Slot()
+    def run(self):
+        self.done_count = 0
+        try:
+            asyncio.run(extract_metadata_all(self.paths, self.api_key, self._on_result, use_cache=self.use_cache))
+        except Exception as e:
+            self.log.emit(f"❌ Extraction stopped: {e}")
+        finally:
+            # Always hand the window back, even if the pool or the client failed
+            self.finished.emit()
+
+    def _on_result(self, index, meta, error):
+        fname = os.path.basename(self.paths[index])
+        if error is None:
+            result = {"fname": fname, "meta": meta}
+        else:
+            result = {"fname": fname, "meta": {}, "error": str(error)}
+        self.done_count += 1
+        self.row_ready.emit(result)
+        self.progress.emit(self.done_count, len(self.paths))
+
 
 class PDFExtractorGUI(QWidget):
     def __init__(self):
@@ -53,6 +100,10 @@ class PDFExtractorGUI(QWidget):
         layout.addWidget(self.prompt_label)
         layout.addWidget(self.prompt_input)
 
+        # Unchanged PDFs normally reuse their results from the last run
+        self.rebuild_checkbox = QCheckBox("Force rebuild (ignore cached results)")
+        layout.addWidget(self.rebuild_checkbox)
+
         # Run Extraction button
         self.run_button = QPushButton("Run Extraction")
         self.run_button.clicked.connect(self.run_extraction)
@@ -75,8 +126,29 @@ class PDFExtractorGUI(QWidget):
         layout.addWidget(self.save_button)
 
         self.setLayout(layout)
-        self.save_data = []
-        self.results_meta = []
+        # Rows stream to a temp CSV during a run; save_csv copies it
+        self.csv_file = None
+        self.csv_path = None
+        self.saved_rows = 0
+
+    def closeEvent(self, event):
+        # The API key is persisted once here rather than on every folder pick
+        self.settings.setValue("openai_api_key", self.api_input.text().strip())
+        self.settings.sync()
+        self._remove_temp_csv()
+        super().closeEvent(event)
+
+    def _remove_temp_csv(self):
+        # Each run writes a fresh temp CSV; the previous one is deleted, never left in /tmp
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+        if self.csv_path is not None:
+            try:
+                os.remove(self.csv_path)
+            except OSError:
+                pass
+            self.csv_path = None
 
     def choose_folder(self):
         folder = QFileDialog.getExistingDirectory(
@@ -84,10 +156,6 @@ class PDFExtractorGUI(QWidget):
         )
         if folder:
             self.settings.setValue("last_folder", folder)
-            key = self.api_input.text().strip()
-            self.settings.setValue("openai_api_key", key)
-            openai.api_key = key
-            self.settings.sync()
             self.folder_label.setText(folder)
 
     def run_extraction(self):
@@ -101,64 +169,85 @@ class PDFExtractorGUI(QWidget):
             self._finish_run()
             return
 
-        # save and apply API key
+        # save and apply API key; QSettings flushes to disk lazily, and closeEvent syncs once
         key = self.api_input.text().strip()
         self.settings.setValue("openai_api_key", key)
         openai.api_key = key
-        self.settings.sync()
 
-        pdfs = [f for f in os.listdir(folder) if f.lower().endswith(".pdf")]
-        total = len(pdfs)
-        found = 0
+        with os.scandir(folder) as entries:
+            paths = [e.path for e in entries if e.is_file() and e.name.lower().endswith(".pdf")]
+        self.total = len(paths)
+        self.found = 0
         self.debug_output.clear()
-        self.results_meta.clear()
-
-        for idx, fname in enumerate(pdfs, 1):
-            path = os.path.join(folder, fname)
-            self.debug_output.append(f"Processing {fname}...")
-            meta = extract_metadata(path)
-            self.results_meta.append((fname, meta))
-            tests = meta.get("positionality_tests", [])
-            conf = meta.get("positionality_confidence", "low")
-            snippet = ""
-            if tests:
-                found += 1
-                snippets = meta.get("positionality_snippets", {}) or {}
-                snippet = snippets.get("gpt_full_text") or snippets.get("header") or snippets.get("tail", "")
-                icon = "✅"
-                line = f"{icon} {fname} – {snippet} (confidence={conf})"
-            else:
-                icon = "❌"
-                line = f"{icon} {fname} – No positionality statement found (confidence={conf})."
-            self.debug_output.append(line)
-            self.progress_bar.setValue(int(idx / total * 100))
-            QApplication.processEvents()
-
-        self.debug_output.append(f"🔄 Extraction complete: {found}/{total} statements found.")
-        QApplication.processEvents()
+        self.progress_bar.setValue(0)
+        self.save_button.setEnabled(False)
+
+        # Memory stays flat however many PDFs there are, and flushed rows survive a crash
+        self._remove_temp_csv()
+        fd, self.csv_path = tempfile.mkstemp(suffix=".csv")
+        self.csv_file = os.fdopen(fd, "w", newline="", encoding="utf-8")
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(CSV_HEADER)
+        self.saved_rows = 0
+
+        self.worker_thread = QThread(self)
+        self.worker = ExtractionWorker(paths, key, use_cache=not self.rebuild_checkbox.isChecked())
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.row_ready.connect(self.on_row)
+        self.worker.log.connect(self.debug_output.append)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.worker_thread.finished.connect(self.on_finished)
+        self.worker_thread.start()
+
+    def on_progress(self, done, total):
+        self.progress_bar.setValue(int(done / total * 100))
+
+    def on_row(self, result):
+        fname = result["fname"]
+        meta = result["meta"]
+        if "error" in result:
+            self.debug_output.append(f"⚠️ {fname} – Error: {result['error']}")
+            return
+        tests = meta.get("positionality_tests", [])
+        conf = meta.get("positionality_confidence", "low")
+        header = (meta.get("positionality_snippets", {}) or {}).get("header", "")
+        self.csv_writer.writerow([fname, bool(tests), conf, header])
+        self.saved_rows += 1
+        if self.saved_rows % CSV_FLUSH_ROWS == 0:
+            self.csv_file.flush()
+        if tests:
+            self.found += 1
+            snippets = meta.get("positionality_snippets", {}) or {}
+            snippet = snippets.get("gpt_full_text") or snippets.get("header") or snippets.get("tail", "")
+            line = f"✅ {fname} – {snippet} (confidence={conf})"
+        else:
+            line = f"❌ {fname} – No positionality statement found (confidence={conf})."
+        self.debug_output.append(line)
+
+    def on_finished(self):
+        self.debug_output.append(f"🔄 Extraction complete: {self.found}/{self.total} statements found.")
         self._finish_run()
 
     def _finish_run(self):
-        # Run time summary and prepare data for saving without re-running extractor
-        self.save_data = []
+        # Close the streamed CSV and suggest a name for saving it
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
         desktop = os.path.join(os.path.expanduser("~"), "Desktop")
         default_name = datetime.now().strftime("positionality_%Y%m%d_%H%M%S.csv")
         self.save_initial = os.path.join(desktop, default_name)
 
-        for fname, meta in self.results_meta:
-            detected = bool(meta.get("positionality_tests"))
-            conf = meta.get("positionality_confidence", "low")
-            snippet = (meta.get("positionality_snippets", {}) or {}).get("header", "")
-            self.save_data.append((fname, detected, conf, snippet))
-
         # re-enable button
         self.run_button.setText("Run Extraction")
         self.run_button.setEnabled(True)
         # enable save
-        self.save_button.setEnabled(bool(self.save_data))
+        self.save_button.setEnabled(self.saved_rows > 0)
 
     def save_csv(self):
-        if not self.save_data:
+        if not self.saved_rows:
             return
         fname, _ = QFileDialog.getSaveFileName(
             self,
@@ -167,11 +256,7 @@ class PDFExtractorGUI(QWidget):
             "CSV Files (*.csv)"
         )
         if fname:
-            with open(fname, "w", newline="", encoding="utf-8") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["Filename", "Detected", "Confidence", "Snippet"])
-                for row in self.save_data:
-                    writer.writerow(row)
+            shutil.copyfile(self.csv_path, fname)
             self.debug_output.append(f"CSV saved to {fname}")
 
 if __name__ == "__main__":
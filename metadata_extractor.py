@@ -1,11 +1,178 @@
 import os
+import json
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 import openai
 openai.api_key = os.getenv("OPENAI_API_KEY", "")
+# Shared by every GUI that imports this module: the client retries 429/5xx/timeouts
+# with exponential backoff, and a hung socket gives up after 30s instead of stalling the run
+openai.max_retries = 5
+openai.timeout = 30.0
 import fitz  # PyMuPDF
 import re
-import pdfplumber
 import requests
-from PyPDF2 import PdfReader
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from response_cache import ResponseCache, request_key
+from parallel_openai import CHARS_PER_TOKEN, ParallelProcessor, make_async_client
+
+# One keep-alive pool for every Crossref/DataCite call, so lookups reuse TCP+TLS sessions;
+# transient 429/5xx answers are retried with backoff by urllib3
+_session = requests.Session()
+# Sent with every lookup; Crossref routes identified clients to its faster "polite" pool
+_session.headers["User-Agent"] = "py-extractor/0.3 (mailto:youremail@example.com)"
+_session.mount("https://", HTTPAdapter(
+    pool_connections=32, pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False),
+))
+
+# Positionality statements sit in the front matter or the closing sections, so
+# whole-document scans only look at the first FRONT_PAGES and last BACK_PAGES pages
+FRONT_PAGES = 30
+BACK_PAGES = 10
+
+# Crossref/DataCite answers are reused from the on-disk cache for this long (seconds)
+LOOKUP_TTL = 30 * 24 * 3600
+
+# Compiled once at import; every PDF runs these, several times per file
+_TITLE_RE = re.compile(r"^Title:\s*(.*)$", re.MULTILINE)
+_AUTHOR_RE = re.compile(r"^Author[s]?:\s*(.*)$", re.MULTILINE)
+_DOI_LABEL_RE = re.compile(r"doi:\s*(10\.\d{4,9}/[-._;()/:A-Z0-9]+)", re.IGNORECASE)
+_DOI_RE = re.compile(r"10\.\d{4,9}/[-._;()/:A-Z0-9]+", re.IGNORECASE)
+_SECTION_RE = re.compile(r"\b(Discussion|Implications|Conclusion)\b", re.IGNORECASE)
+_FILENAME_AUTHOR_RE = re.compile(r"^([A-Za-z]+)(?:-et-al)?(?:-\d{4}.*)?$")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Cues that usually sit right next to a positionality statement
+_POSITIONALITY_CUE_RE = re.compile(r"positionalit|reflexiv|\bI am\b|\bwe are\b", re.IGNORECASE)
+
+# AI snippets: ~1500 chars either side of the first cue, else the leading SNIPPET_TOKENS
+SNIPPET_TOKENS = 1250
+CUE_WINDOW_CHARS = 1500
+# The closing-section check in extract_positionality sends a tighter window: ±750 chars
+# around the first cue, else the section's first ~1500 chars
+TAIL_WINDOW_CHARS = 750
+TAIL_WINDOW_TOKENS = 2 * TAIL_WINDOW_CHARS // CHARS_PER_TOKEN
+
+_POSITIONALITY_TESTS = {
+    "explicit_positionality":   re.compile(r"\b(?:My|Our) positionality\b", re.IGNORECASE),
+    "first_person_reflexivity": re.compile(r"\bI\s+(?:reflect|acknowledge|consider|recognize)\b", re.IGNORECASE),
+    "researcher_self":          re.compile(r"\bI,?\s*as a researcher,", re.IGNORECASE),
+    "author_self":              re.compile(r"\bI,?\s*as (?:the )?author,", re.IGNORECASE),
+    "as_a_role":                re.compile(r"\bAs a [A-Z][a-z]+(?: [A-Z][a-z]+)*,\s*I\b", re.IGNORECASE),
+    "I_position":               re.compile(r"\bI\s+(?:position|situat)\b", re.IGNORECASE),
+    "I_situated":               re.compile(r"\bI\s+situat\w*\b", re.IGNORECASE),
+    "positionality":            re.compile(r"\bpositionalit\w*\b", re.IGNORECASE),
+    "self_reflexivity":         re.compile(r"\bI\s+(?:reflect|reflective|reflexiv)\w*\b", re.IGNORECASE),
+}
+
+# System prompts for the GPT passes in extract_positionality, identical on every call so
+# OpenAI's prompt caching can reuse them; the passage itself goes in the user message
+HEADER_SYSTEM_PROMPT = (
+    "You are a specialist in academic research methods. "
+    "Find sentences where the author explicitly uses first‑person language "
+    "to reflect on their own positionality or biases. "
+    "If none exists in the passage, reply 'NONE'."
+)
+CHUNK_SYSTEM_PROMPT = (
+    "You are a specialist in academic research methods. "
+    "Identify any first‑person (‘I’ or ‘we’) statements in this passage "
+    "where the author Reflects on their own positionality or standpoint. "
+    "If none exists, reply 'NO'."
+)
+HEADER_GROUP_SYSTEM_PROMPT = (
+    HEADER_SYSTEM_PROMPT + " Answer each passage separately, and reply with one entry per passage "
+    "under \"passages\": its id exactly as given in its PASSAGE header, and your reply."
+)
+POSITIONALITY_MODEL = "gpt-4o-mini"
+
+# PDFs in flight at once in extract_metadata_all
+MAX_CONCURRENT_PDFS = 10
+
+# Part of the cached-results key; bump when extract_metadata's output changes,
+# so rows from older code are not reused
+METADATA_CACHE_VERSION = 2
+
+# Header fallbacks are short, so the system prompt dominates their cost: up to
+# HEADER_GROUP_SIZE of them share one request, each waiting at most HEADER_GROUP_WAIT s for company
+HEADER_GROUP_SIZE = MAX_CONCURRENT_PDFS
+HEADER_GROUP_WAIT = 0.5
+HEADER_GROUP_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "header_group",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "passages": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"id": {"type": "string"}, "reply": {"type": "string"}},
+                        "required": ["id", "reply"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["passages"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def front_back_pages(pages):
+    """
+    The first FRONT_PAGES and last BACK_PAGES of a page sequence, without repeats.
+    """
+    n = len(pages)
+    if n <= FRONT_PAGES + BACK_PAGES:
+        return list(pages)
+    return list(pages[:FRONT_PAGES]) + list(pages[n - BACK_PAGES:])
+
+
+def read_page_texts(pdf_path):
+    """
+    Text of the front_back_pages, in page order, from a single open of the file.
+    extract_metadata shares it between the metadata, DOI and positionality scans.
+    Read with PyMuPDF, whose C extractor is many times faster than pdfplumber's
+    pure-Python layout pass. Pages without a text layer (scans, image-only plates)
+    are dropped, so the header and tail scans land on pages that have words on them.
+    """
+    try:
+        with fitz.open(pdf_path) as doc:
+            texts = (doc[i].get_text() for i in front_back_pages(range(doc.page_count)))
+            return [text for text in texts if text.strip()]
+    except Exception as e:
+        print(f"PyMuPDF text extraction failed for {pdf_path}: {e}")
+        return []
+
+def read_first_pages(pdf_path, n=2):
+    """
+    Text of the first n pages with PyMuPDF, for the metadata/DOI scans when called
+    without read_page_texts' output. Like read_page_texts, image-only pages are
+    skipped, looking no further than FRONT_PAGES. Open errors propagate to the caller's handler.
+    """
+    with fitz.open(pdf_path) as doc:
+        texts = (doc[i].get_text() for i in range(min(FRONT_PAGES, doc.page_count)))
+        return list(itertools.islice((text for text in texts if text.strip()), n))
+
+
+def positionality_window(text, max_tokens=SNIPPET_TOKENS, window_chars=CUE_WINDOW_CHARS):
+    """
+    The part of text most likely to hold a positionality statement, for the AI prompt:
+    whitespace collapsed, then window_chars either side of the first positionality
+    cue, or the leading max_tokens (estimated at CHARS_PER_TOKEN) when there is none.
+    """
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    m = _POSITIONALITY_CUE_RE.search(text)
+    if m:
+        start = max(0, m.start() - window_chars)
+        return text[start:m.start() + window_chars]
+    return text[:max_tokens * CHARS_PER_TOKEN]
 
 def extract_metadata_pymupdf(pdf_path):
     """
@@ -14,8 +181,8 @@ def extract_metadata_pymupdf(pdf_path):
     """
     meta = {"title": None, "author": None, "subject": None, "keywords": None, "creation_date": None, "producer": None}
     try:
-        doc = fitz.open(pdf_path)
-        raw = doc.metadata
+        with fitz.open(pdf_path) as doc:
+            raw = doc.metadata
         meta.update({
             "title": raw.get("title"),
             "author": raw.get("author"),
@@ -29,52 +196,97 @@ def extract_metadata_pymupdf(pdf_path):
     return meta
 
 
-def extract_metadata_pdfplumber(pdf_path):
+def extract_metadata_pdfplumber(pdf_path, page_texts=None):
     """
-    Extract text-based metadata using pdfplumber by scanning the first two pages.
+    Extract text-based metadata by scanning the first two pages: page_texts
+    (see read_page_texts) when given, else read with PyMuPDF.
     Returns dict: title, author, journal, volume, issue, pages, doi.
     """
     meta = {"title": None, "author": None, "journal": None, "volume": None, "issue": None, "pages": None, "doi": None}
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = "".join(page.extract_text() or "" for page in pdf.pages[:2])
-        match = re.search(r"^Title:\s*(.*)$", text, re.MULTILINE)
+        if page_texts is None:
+            page_texts = read_first_pages(pdf_path)
+        text = "".join(page_texts[:2])
+        match = _TITLE_RE.search(text)
         if match: meta["title"] = match.group(1).strip()
-        match = re.search(r"^Author[s]?:\s*(.*)$", text, re.MULTILINE)
+        match = _AUTHOR_RE.search(text)
         if match: meta["author"] = match.group(1).strip()
-        match = re.search(r"doi:\s*(10\.\d{4,9}/[-._;()/:A-Z0-9]+)", text, re.IGNORECASE)
+        match = _DOI_LABEL_RE.search(text)
         if match: meta["doi"] = match.group(1)
     except Exception as e:
-        print(f"PdfPlumber metadata extraction failed for {pdf_path}: {e}")
+        print(f"Text metadata extraction failed for {pdf_path}: {e}")
     return meta
 
 
-def extract_doi(pdf_path):
+def extract_doi(pdf_path, page_texts=None):
     """
-    Scan the first two pages for a DOI using PyPDF2.
+    Scan the first two pages for a DOI, from page_texts when given, else read with PyMuPDF.
     """
     try:
-        reader = PdfReader(pdf_path)
-        text = "".join(page.extract_text() or "" for page in reader.pages[:2])
-        match = re.search(r"10\.\d{4,9}/[-._;()/:A-Z0-9]+", text, re.IGNORECASE)
+        if page_texts is None:
+            page_texts = read_first_pages(pdf_path)
+        text = "".join(page_texts[:2])
+        match = _DOI_RE.search(text)
         if match: return match.group(0)
     except Exception as e:
-        print(f"PyPDF2 DOI extraction failed for {pdf_path}: {e}")
+        print(f"DOI extraction failed for {pdf_path}: {e}")
     return None
 
 
+# sqlite connections can't cross threads, and the GUIs call lookups from worker threads
+_cache_local = threading.local()
+
+
+# In-process memo of the real answers _cached_lookup has seen, by cache key
+_lookup_memo = {}
+
+
+def _lookup_cache():
+    cache = getattr(_cache_local, "cache", None)
+    if cache is None:
+        cache = _cache_local.cache = ResponseCache()
+    return cache
+
+
+def _cached_lookup(source, query, fetch):
+    """
+    fetch(query) through the ResponseCache: a stored answer younger than LOOKUP_TTL
+    seconds is returned without touching the network. Returns a fresh dict each call.
+    """
+    key = request_key({"lookup": source, "query": query})
+    if key in _lookup_memo:
+        return dict(_lookup_memo[key])
+    cached = _lookup_cache().get(key)
+    if cached is not None:
+        entry = json.loads(cached)
+        if time.time() - entry["fetched_at"] < LOOKUP_TTL:
+            _lookup_memo[key] = entry["result"]
+            return dict(entry["result"])
+    result = fetch(query)
+    # Only real answers are kept, in memory or on disk; errors and misses are retried next call
+    if result:
+        _lookup_memo[key] = result
+        _lookup_cache().set(key, json.dumps({"fetched_at": time.time(), "result": result}))
+    return dict(result)
+
+
 def crossref_lookup(doi_or_title):
     """
     Lookup metadata from Crossref using DOI or title.
     Returns dict: journal, volume, issue, author, title.
+    Answers are memoized in-process and persisted in the ResponseCache (for LOOKUP_TTL),
+    so a re-run over the same folder skips the HTTP round trip.
     """
-    headers = {"User-Agent": "py-extractor/0.3 (mailto:youremail@example.com)"}
+    return _cached_lookup("crossref", doi_or_title, _crossref_fetch)
+
+
+def _crossref_fetch(doi_or_title):
     if isinstance(doi_or_title, str) and doi_or_title.startswith("10."):
         url = f"https://api.crossref.org/works/{doi_or_title}"
     else:
         url = "https://api.crossref.org/works?query.title=" + requests.utils.quote(doi_or_title or "")
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
+        resp = _session.get(url, timeout=10)
         if resp.status_code != 200:
             #print(f"Crossref lookup returned status {resp.status_code} for {doi_or_title}")
             return {}
@@ -91,17 +303,23 @@ def crossref_lookup(doi_or_title):
         print(f"Crossref lookup network error for {doi_or_title}: {e}")
     except ValueError:
         #print(f"Crossref lookup returned invalid JSON for {doi_or_title}")
-        return {}
+        pass
+    return {}
 
 
 def datacite_lookup(doi):
     """
     Lookup metadata from DataCite using DOI.
     Returns dict: journal, volume, issue, author, title.
+    Cached like crossref_lookup.
     """
+    return _cached_lookup("datacite", doi, _datacite_fetch)
+
+
+def _datacite_fetch(doi):
     url = f"https://api.datacite.org/works/{doi}"
     try:
-        resp = requests.get(url, timeout=10)
+        resp = _session.get(url, timeout=10)
         if resp.status_code != 200:
             print(f"DataCite lookup returned status {resp.status_code} for {doi}")
             return {}
@@ -122,41 +340,157 @@ def datacite_lookup(doi):
         print(f"DataCite lookup returned invalid JSON for {doi}")
     return {}
 
-import re
-import pdfplumber
-import openai  # make sure your key is configured
 
-def extract_positionality(pdf_path):
+def header_request(header_text):
+    """
+    Chat request for the GPT fallback on the first page; the reply is 'NONE' or the sentences found.
+    """
+    return {
+        "model": POSITIONALITY_MODEL,
+        "messages": [
+            {"role": "system", "content": HEADER_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    "Passage:\n\n" + header_text[:500]
+                )
+            }
+        ],
+        "temperature": 0.0
+    }
+
+
+def chunk_request(chunk):
+    """
+    Chat request for the candidate passage of the closing sections; a hit starts with 'YES'.
+    """
+    return {
+        "model": POSITIONALITY_MODEL,
+        "messages": [
+            {"role": "system", "content": CHUNK_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": "Passage:\n\n" + chunk
+            }
+        ],
+        "temperature": 0
+    }
+
+
+def header_group_request(items):
+    """
+    One request asking the header question about several (id, passage) pairs;
+    the reply lists them under "passages".
+    """
+    body = "\n\n".join(f"--- PASSAGE {item_id} ---\n{passage}" for item_id, passage in items)
+    return {
+        "model": POSITIONALITY_MODEL,
+        "messages": [
+            {"role": "system", "content": HEADER_GROUP_SYSTEM_PROMPT},
+            {"role": "user", "content": body}
+        ],
+        "temperature": 0.0,
+        "response_format": HEADER_GROUP_RESPONSE_FORMAT
+    }
+
+
+class HeaderBatcher:
+    """
+    complete() for extract_positionality_async that packs concurrent header_request()s
+    into header_group_requests, up to group_size per call; every other request goes
+    straight to processor.complete. A passage missing from a grouped reply (or a group
+    that fails) is asked again on its own.
+    """
+
+    def __init__(self, processor, group_size=HEADER_GROUP_SIZE, wait=HEADER_GROUP_WAIT):
+        self.processor = processor
+        self.group_size = group_size
+        self.wait = wait
+        self.pending = []  # (request, future) waiting for the next group
+        self.timer = None
+        self.tasks = set()
+
+    async def complete(self, request):
+        if request["messages"][0]["content"] != HEADER_SYSTEM_PROMPT:
+            return await self.processor.complete(request)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((request, future))
+        if len(self.pending) >= self.group_size:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        group, self.pending = self.pending, []
+        if group:
+            task = asyncio.create_task(self._send(group))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _send(self, group):
+        items = [(str(i), request["messages"][1]["content"].removeprefix("Passage:\n\n"))
+                 for i, (request, _) in enumerate(group)]
+        try:
+            reply = json.loads(await self.processor.complete(header_group_request(items)))
+            answers = {p["id"]: p["reply"] for p in reply.get("passages", [])}
+        except Exception:
+            answers = {}
+
+        async def single(request, future):
+            try:
+                future.set_result(await self.processor.complete(request))
+            except Exception as e:
+                future.set_exception(e)
+
+        singles = []
+        for (item_id, _), (request, future) in zip(items, group):
+            if item_id in answers:
+                future.set_result(answers[item_id])
+            else:
+                singles.append(single(request, future))
+        await asyncio.gather(*singles)
+
+
+async def _complete_blocking(request):
+    """
+    The module-level OpenAI client behind the async complete() interface, for the
+    synchronous entry points (one PDF, one call at a time, under asyncio.run).
+    """
+    resp = openai.chat.completions.create(**request)
+    return resp.choices[0].message.content
+
+
+def extract_positionality(pdf_path, page_texts=None):
     """
     Extract positionality/reflexivity statements via regex + GPT header fallback + tail scan + conditional GPT-4 full-text pass.
+    page_texts (see read_page_texts) is read from pdf_path when not given.
     Returns dict with keys: positionality_tests (list), positionality_snippets (dict), positionality_score (float).
     """
+    if page_texts is None:
+        page_texts = read_page_texts(pdf_path)
+    return asyncio.run(extract_positionality_async(page_texts, _complete_blocking))
+
+
+async def extract_positionality_async(page_texts, complete):
+    """
+    extract_positionality over already-read page_texts, with every model call made through
+    complete: an async callable taking a chat request dict and returning the reply text,
+    such as ParallelProcessor.complete, so many PDFs' calls can be in flight at once.
+    """
     matched = []
     snippets = {}
     score = 0.0
 
     # 1) Header regex tests (first page)
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            pages = pdf.pages
-            header_text = pages[0].extract_text() or ""
-    except Exception:
-        header_text = ""
-
-    tests = {
-        "explicit_positionality":   re.compile(r"\b(?:My|Our) positionality\b", re.IGNORECASE),
-        "first_person_reflexivity": re.compile(r"\bI\s+(?:reflect|acknowledge|consider|recognize)\b", re.IGNORECASE),
-        "researcher_self":          re.compile(r"\bI,?\s*as a researcher,", re.IGNORECASE),
-        "author_self":              re.compile(r"\bI,?\s*as (?:the )?author,", re.IGNORECASE),
-        "as_a_role":                re.compile(r"\bAs a [A-Z][a-z]+(?: [A-Z][a-z]+)*,\s*I\b", re.IGNORECASE),
-        "I_position":               re.compile(r"\bI\s+(?:position|situat)\b", re.IGNORECASE),
-        "I_situated":               re.compile(r"\bI\s+situat\w*\b", re.IGNORECASE),
-        "positionality":            re.compile(r"\bpositionalit\w*\b", re.IGNORECASE),
-        "self_reflexivity":         re.compile(r"\bI\s+(?:reflect|reflective|reflexiv)\w*\b", re.IGNORECASE),
+    header_text = page_texts[0] if page_texts else ""
 
-    }
 
-    for name, pat in tests.items():
+    for name, pat in _POSITIONALITY_TESTS.items():
         m = pat.search(header_text)
         if m:
             matched.append(name)
@@ -165,42 +499,15 @@ def extract_positionality(pdf_path):
 
     # 2) GPT-fallback on header if no regex hit
     if not matched and header_text:
-        snippet = header_text[:500]
-        resp = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a specialist in academic research methods. "
-                        "Find sentences where the author explicitly uses first‑person language "
-                        "to reflect on their own positionality or biases. "
-                        "If none exists in the passage, reply 'NONE'."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        "Passage:\n\n" + header_text[:500]
-                    )
-                }
-            ],
-            temperature=0.0
-        )
-
-        answer = resp.choices[0].message.content.strip()
+        answer = (await complete(header_request(header_text))).strip()
         if answer.upper() != "NONE":
             matched.append("gpt_header")
             snippets["gpt_header"] = answer
 
-    # 3) Tail-end regex scan (last 2 pages)
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            tail_text = "\n".join(p.extract_text() or "" for p in pdf.pages[-2:])
-    except Exception:
-        tail_text = ""
+    # 3) Tail-end regex scan (last 2 pages with text; front_back_pages always keeps them)
+    tail_text = "\n".join(page_texts[-2:])
 
-    tail_hits = [name for name, pat in tests.items() if pat.search(tail_text)]
+    tail_hits = [name for name, pat in _POSITIONALITY_TESTS.items() if pat.search(tail_text)]
     if tail_hits:
         for name in tail_hits:
             if name not in matched:
@@ -210,62 +517,30 @@ def extract_positionality(pdf_path):
 
     # 4) Baseline score
     if score == 0.0:
-        score = len(matched) / (len(tests) + 2)
+        score = len(matched) / (len(_POSITIONALITY_TESTS) + 2)
 
     # 5) Conditional full-text GPT-4 pass
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            full_text = "\n".join(p.extract_text() or "" for p in pdf.pages)
-            page_count = len(pdf.pages)
-    except Exception:
-        full_text = ""
-        page_count = 0
+    full_text = "\n".join(page_texts)
 
     # after computing `score` and loading full_text…
 
     # only invoke full‐text GPT if:
     # 1) there was some regex/tail signal (score ≥ 0.1)
     # 2) and the PDF actually has a Discussion/Implications/Conclusion heading
-    needs_ai = (
-        score >= 0.1
-        and bool(re.search(r"\b(Discussion|Implications|Conclusion)\b",
-                           full_text,
-                           re.IGNORECASE))
-    )
+    # (one section search serves both the check and the tail split)
+    m = _SECTION_RE.search(full_text) if score >= 0.1 else None
+    needs_ai = m is not None
 
     if needs_ai:
-        m = re.search(r"(Discussion|Implications|Conclusion)", full_text, re.IGNORECASE)
-        tail = full_text[m.start():] if m else full_text
-        words = tail.split()
-        chunk_size = 500
-        for i in range(0, len(words), chunk_size):
-            chunk = " ".join(words[i:i+chunk_size])
-            resp = openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a specialist in academic research methods. "
-                            "Identify any first‑person (‘I’ or ‘we’) statements in this passage "
-                            "where the author Reflects on their own positionality or standpoint. "
-                            "If none exists, reply 'NO'."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": "Passage:\n\n" + chunk
-                    }
-                ],
-                temperature=0
-            )
-            answer = resp.choices[0].message.content.strip()
-            if answer.upper().startswith("YES"):
-                matched.append("gpt_full_text")
-                snippet = answer.splitlines()[1] if "\n" in answer else answer
-                snippets["gpt_full_text"] = snippet
-                score = 1.0
-                break
+        tail = full_text[m.start():]
+        # One window around the first cue, not every 500-word slice of the closing sections
+        chunk = positionality_window(tail, TAIL_WINDOW_TOKENS, TAIL_WINDOW_CHARS)
+        answer = (await complete(chunk_request(chunk))).strip()
+        if answer.upper().startswith("YES"):
+            matched.append("gpt_full_text")
+            snippet = answer.splitlines()[1] if "\n" in answer else answer
+            snippets["gpt_full_text"] = snippet
+            score = 1.0
 
     return {
         "positionality_tests": matched,
@@ -274,15 +549,48 @@ def extract_positionality(pdf_path):
     }
 
 
-def extract_metadata(pdf_path):
+def collect_positionality_requests(page_texts):
+    """
+    Every model request extract_positionality_async could send for page_texts, for a
+    Batch API job. Only a tail-section regex hit can open the full-text pass (a single
+    header match scores below its 0.1 threshold), so the header answer never changes
+    whether the closing-section request is needed.
+    """
+    collected = []
+
+    async def record(request):
+        collected.append(request)
+        return "NONE"
+
+    asyncio.run(extract_positionality_async(page_texts, record))
+    return collected
+
+
+def positionality_from_replies(page_texts, replies):
+    """
+    extract_positionality's result from the answers to collect_positionality_requests(),
+    given as {request_key(request): reply text}. Raises KeyError if one is missing.
+    """
+    async def replay(request):
+        return replies[request_key(request)]
+
+    return asyncio.run(extract_positionality_async(page_texts, replay))
+
+
+def extract_metadata_local(pdf_path):
+    """
+    Every extract_metadata step except the positionality scan's model calls: embedded + text
+    metadata and the DOI/Crossref/DataCite fill-ins. Returns (meta, page_texts).
+    """
+    page_texts = read_page_texts(pdf_path)
     meta = {}
     meta.update(extract_metadata_pymupdf(pdf_path))
-    text_meta = extract_metadata_pdfplumber(pdf_path)
+    text_meta = extract_metadata_pdfplumber(pdf_path, page_texts)
     meta.update(text_meta)
 
     if meta.get("doi"): meta["doi"] = meta["doi"].strip().rstrip('.;,')
     if not meta.get("doi"):
-        doi = extract_doi(pdf_path)
+        doi = extract_doi(pdf_path, page_texts)
         if doi: meta["doi"] = doi.strip().rstrip('.;,')
 
     if meta.get("doi"):
@@ -299,14 +607,19 @@ def extract_metadata(pdf_path):
     if not meta.get("author"):
         base = os.path.basename(pdf_path)
         nm = os.path.splitext(base)[0]
-        m = re.match(r"^([A-Za-z]+)(?:-et-al)?(?:-\d{4}.*)?$", nm)
+        m = _FILENAME_AUTHOR_RE.match(nm)
         if m:
             lead = m.group(1).replace("-"," ").title()
             auth = f"{lead} et al." if "-et-al" in nm else lead
             meta["author"] = auth
             meta["author_from_filename"] = auth
+    return meta, page_texts
+
 
-    pos = extract_positionality(pdf_path)
+def apply_positionality(meta, pos):
+    """
+    Store an extract_positionality result on meta, with its confidence bucket.
+    """
     meta["positionality_tests"]   = pos.get("positionality_tests", [])
     meta["positionality_snippets"] = pos.get("positionality_snippets", {})
     meta["positionality_score"]    = pos.get("positionality_score", 0.0)
@@ -315,3 +628,73 @@ def extract_metadata(pdf_path):
     return meta
 
 
+def extract_metadata(pdf_path, with_text=False):
+    """
+    Embedded + text metadata, DOI/Crossref/DataCite fill-ins and the positionality scan,
+    with the page text extracted once and shared by every step.
+    With with_text, return (meta, text) so callers can reuse the front/back page text too.
+    """
+    meta, page_texts = extract_metadata_local(pdf_path)
+    apply_positionality(meta, extract_positionality(pdf_path, page_texts))
+    if with_text:
+        return meta, " ".join(page_texts)
+    return meta
+
+
+async def extract_metadata_async(pdf_path, complete, executor=None):
+    """
+    extract_metadata for the concurrent runners: the parsing and lookups run on executor
+    (the loop's default thread pool if None), so the event loop keeps other PDFs' model
+    calls moving, and the positionality calls go through complete (see extract_positionality_async).
+    """
+    loop = asyncio.get_running_loop()
+    meta, page_texts = await loop.run_in_executor(executor, extract_metadata_local, pdf_path)
+    return apply_positionality(meta, await extract_positionality_async(page_texts, complete))
+
+
+def metadata_cache_keys(pdf_path):
+    """
+    (pdf key, settings key) for the ResponseCache results table: the file by absolute
+    path, mtime and size (a stat, no need to hash its bytes), the extractor by version and model.
+    """
+    st = os.stat(pdf_path)
+    pdf_key = request_key({"path": os.path.abspath(pdf_path), "mtime_ns": st.st_mtime_ns, "size": st.st_size})
+    settings_key = request_key({"extract_metadata": METADATA_CACHE_VERSION, "model": POSITIONALITY_MODEL})
+    return pdf_key, settings_key
+
+
+async def extract_metadata_all(paths, api_key, on_result, max_concurrent=MAX_CONCURRENT_PDFS,
+                               use_cache=True):
+    """
+    Run extract_metadata_async over every path with at most max_concurrent PDFs in flight,
+    all model calls sharing one ParallelProcessor (rate buckets, retries on 429/5xx) over one
+    AsyncOpenAI connection pool, with header checks grouped by a HeaderBatcher. The parsing
+    runs on a process pool, so PDFs parse on separate cores rather than behind the GIL.
+    on_result(index, result, error) is called on the event loop's thread as each PDF
+    finishes, in completion order; error is the exception, if any.
+    Unchanged files (see metadata_cache_keys) get their meta from the previous run;
+    use_cache=False re-extracts everything and refreshes the stored results.
+    """
+    client = make_async_client(api_key)
+    complete = HeaderBatcher(ParallelProcessor(client)).complete
+    sem = asyncio.Semaphore(max_concurrent)
+    pool = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, max_concurrent))
+
+    async def run(index, path):
+        async with sem:
+            try:
+                keys = metadata_cache_keys(path)
+                result = _lookup_cache().get_result(*keys) if use_cache else None
+                if result is None:
+                    result = await extract_metadata_async(path, complete, pool)
+                    _lookup_cache().set_result(*keys, result)
+                error = None
+            except Exception as e:
+                result, error = None, e
+        on_result(index, result, error)
+
+    try:
+        await asyncio.gather(*(run(index, path) for index, path in enumerate(paths)))
+    finally:
+        pool.shutdown()
+        await client.close()
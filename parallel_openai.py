@@ -0,0 +1,154 @@
+import asyncio
+import random
+import time
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from response_cache import request_key
+
+# Defaults sized for a typical gpt-4o tier; lower them if you still see 429s.
+MAX_REQUESTS_PER_MINUTE = 500
+MAX_TOKENS_PER_MINUTE = 30000
+MAX_ATTEMPTS = 5
+
+# Transient failures worth another attempt; anything else (bad request, auth) is raised at once
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError)
+
+# Keep-alive pool sized well above the GUI's in-flight cap so calls never wait for a socket
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+HTTP_TIMEOUT = 60.0
+
+# Rough English average used for all token estimates (no tokenizer dependency)
+CHARS_PER_TOKEN = 4
+
+
+def make_async_client(api_key):
+    """
+    AsyncOpenAI client on a tuned httpx connection pool, so every request in a run
+    reuses the same TCP+TLS sessions instead of negotiating new ones.
+    """
+    return AsyncOpenAI(
+        api_key=api_key,
+        http_client=httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+    )
+
+
+def estimate_tokens(request):
+    """
+    Rough token cost of a chat-completion request: ~4 characters per prompt token
+    plus the completion budget.
+    """
+    chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+    return chars // CHARS_PER_TOKEN + request.get("max_tokens", 0)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Cut text to roughly max_tokens prompt tokens, so no request pays for more input than it needs.
+    """
+    return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+class ParallelProcessor:
+    """
+    Throttle concurrent chat-completion calls against requests-per-minute and
+    tokens-per-minute budgets, retrying rate-limited and other transient failures
+    (timeouts, dropped connections, 5xx) with exponential backoff.
+    Port of the OpenAI cookbook's api_request_parallel_processor.py.
+    An optional ResponseCache lets complete() skip requests answered on an earlier run.
+    """
+
+    def __init__(self, client, max_requests_per_minute=MAX_REQUESTS_PER_MINUTE,
+                 max_tokens_per_minute=MAX_TOKENS_PER_MINUTE, max_attempts=MAX_ATTEMPTS, cache=None):
+        # The SDK's own retries are switched off (on a copy sharing the same connection pool):
+        # _send retries RETRYABLE_ERRORS itself, so every attempt passes back through the
+        # rate buckets instead of multiplying behind them (5 x 3 attempts with both layers on)
+        self.client = client.with_options(max_retries=0)
+        self.cache = cache
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.max_attempts = max_attempts
+        self.available_request_capacity = max_requests_per_minute
+        self.available_token_capacity = max_tokens_per_minute
+        self.last_update_time = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _replenish(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update_time
+        self.available_request_capacity = min(
+            self.available_request_capacity + self.max_requests_per_minute * elapsed / 60.0,
+            self.max_requests_per_minute,
+        )
+        self.available_token_capacity = min(
+            self.available_token_capacity + self.max_tokens_per_minute * elapsed / 60.0,
+            self.max_tokens_per_minute,
+        )
+        self.last_update_time = now
+
+    async def _wait_for_capacity(self, tokens):
+        # A single request larger than the whole budget would otherwise never fire
+        tokens = min(tokens, self.max_tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._replenish()
+                if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= tokens
+                    return
+                await asyncio.sleep(1)
+
+    async def create(self, request):
+        """
+        Send one chat-completion request (a dict of create() kwargs) once both
+        buckets have capacity. Raises the last RETRYABLE_ERRORS error after max_attempts.
+        """
+        return await self._send(self.client.chat.completions.create, request)
+
+    async def _send(self, call, request):
+        tokens = estimate_tokens(request)
+        for attempt in range(1, self.max_attempts + 1):
+            await self._wait_for_capacity(tokens)
+            try:
+                return await call(**request)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_attempts:
+                    raise
+                await asyncio.sleep(2 ** attempt + random.random())
+
+    async def complete(self, request):
+        """
+        Like create(), but return the reply text, served from the cache
+        (and stored back into it) when one is configured.
+        """
+        key = request_key(request) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        response = await self.create(request)
+        content = response.choices[0].message.content
+        if key is not None:
+            self.cache.set(key, content)
+        return content
+
+    async def parse(self, request, response_format):
+        """
+        Structured-output call: return the reply parsed into the Pydantic model
+        response_format (None if the model refused). Cached like complete().
+        """
+        key = None
+        if self.cache is not None:
+            key = request_key(dict(request, response_format=response_format.model_json_schema()))
+            cached = self.cache.get(key)
+            if cached is not None:
+                return response_format.model_validate_json(cached)
+        response = await self._send(self.client.beta.chat.completions.parse,
+                                    dict(request, response_format=response_format))
+        message = response.choices[0].message
+        if key is not None and message.parsed is not None:
+            self.cache.set(key, message.content)
+        return message.parsed
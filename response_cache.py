@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+CACHE_PATH = os.path.expanduser("~/.py_extractor_cache.sqlite3")
+
+
+def request_key(request):
+    """
+    Content hash of a chat-completion request (model, prompt, text, sampling settings).
+    The same request on a rerun maps to the same key.
+    """
+    blob = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    sha256 of a file's bytes, so a renamed or re-downloaded copy of the same PDF maps to one key.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk map from request_key() to the model's reply text, so re-running a folder
+    (e.g. while tuning the prompt) only pays for the requests that actually changed.
+    The results table goes one step further: finished CSV rows keyed by
+    (PDF content hash, settings hash), so an unchanged file is not even re-parsed.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.conn = sqlite3.connect(path)
+        # Several worker processes/threads may share the file; WAL lets readers run alongside a writer
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (pdf_hash TEXT, settings_hash TEXT, row TEXT NOT NULL,"
+            " PRIMARY KEY (pdf_hash, settings_hash))"
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        row = self.conn.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, content):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content) VALUES (?, ?)", (key, content)
+            )
+
+    def get_result(self, pdf_hash, settings_hash):
+        row = self.conn.execute(
+            "SELECT row FROM results WHERE pdf_hash = ? AND settings_hash = ?", (pdf_hash, settings_hash)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_result(self, pdf_hash, settings_hash, row):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (pdf_hash, settings_hash, row) VALUES (?, ?, ?)",
+                (pdf_hash, settings_hash, json.dumps(row, ensure_ascii=False)),
+            )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class MetadataModel(BaseModel):
+    """
+    Structured-output schema for the AI metadata fallback; field names match METADATA_FIELDS in extractor_core.
+    """
+    author: str
+    journal: str
+    volume: str
+    issue: str
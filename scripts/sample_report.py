@@ -5,11 +5,13 @@ from metadata_extractor import extract_positionality
 
 PDF_DIR = os.path.expanduser("~/pdfs")
 
+with os.scandir(PDF_DIR) as entries:
+    pdfs = sorted((e for e in entries if e.is_file() and e.name.lower().endswith(".pdf")),
+                  key=lambda e: e.name)
+
 rows = []
-for fn in sorted(os.listdir(PDF_DIR)):
-    if not fn.lower().endswith(".pdf"):
-        continue
-    path = os.path.join(PDF_DIR, fn)
+for entry in pdfs:
+    fn, path = entry.name, entry.path
     print(f"Processing {fn}…", flush=True)
     try:
         res = extract_positionality(path)